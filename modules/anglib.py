@@ -0,0 +1,42 @@
+###############################
+#   Angular Analysis          #
+###############################
+
+# Angles of the t##p## folders of angle-resolved measurements (theta: polar angle, phi:
+# azimuth, in degree). The angles of a data set are parsed once, with one vectorized
+# regex over all folder names (any number of digits, optional decimals, e.g. t105p7.5),
+# into a table shared by the metric sheets, the phi-sorted SPT_* sheets and the polar
+# plots of ext_bklib.
+
+import numpy as np
+import pandas as pd
+
+ANGLE_PATTERN = r't\s*(?P<theta>\d+(?:\.\d+)?)[\s_]*p\s*(?P<phi>\d+(?:\.\d+)?)'
+ANGLE_COLUMNS = [ 'theta', 'phi_rad', 'phi' ]
+
+def angle_index( names ):
+    """theta, phi_rad & phi of every name (NaN if the name has no t##p## angle)"""
+    angle = pd.Series( [ str( n ) for n in names ] ).str.extract( ANGLE_PATTERN ).astype( np.float64 )
+    angle['phi_rad'] = np.deg2rad( angle['phi'] )
+    angle.index = names if isinstance( names, pd.Index ) else pd.Index( names )
+    return angle[ANGLE_COLUMNS]
+
+def angle_table( data ):
+    """data (indexed by folder name) with the angle columns"""
+    data = data.drop( columns = ANGLE_COLUMNS, errors = 'ignore' )
+    return pd.concat( [ data, angle_index( data.index ) ], axis = 1 )
+
+def hemisphere_grid( theta, phi, values, step = 1, method = 'linear' ):
+    """interpolate values measured at ( theta, phi ) onto a regular grid: return ( theta[i], phi[j], values[i, j] ), NaN outside the measured points"""
+    from scipy.interpolate import griddata
+    theta, phi, values = ( np.asarray( a, dtype = np.float64 ) for a in ( theta, phi, values ))
+    valid = ~( np.isnan( theta ) | np.isnan( phi ) | np.isnan( values ))
+    theta, phi, values = theta[valid], phi[valid], values[valid]
+    grid_theta = np.arange( theta.min(), theta.max() + step / 2, step )
+    grid_phi = np.arange( phi.min(), phi.max() + step / 2, step )
+    # - interpolate on the polar projection ( theta cos(phi), theta sin(phi) ), where theta = 0 is one point for all phi
+    def project( t, p ):
+        return t * np.cos( np.deg2rad( p )), t * np.sin( np.deg2rad( p ))
+    T, P = np.meshgrid( grid_theta, grid_phi, indexing = 'ij' )
+    grid = griddata( np.column_stack( project( theta, phi )), values, project( T, P ), method = method )
+    return grid_theta, grid_phi, grid
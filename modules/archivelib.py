@@ -0,0 +1,194 @@
+###############################
+#   Spectral Archive          #
+###############################
+
+# Persistent store of processed results across experiments: one directory with an
+# SQLite index (archive.sqlite) and the spectra as chunked arrays, one .npy chunk
+# (spectra x wavelength) per appended data set, read back as a memory map.
+#
+#   spectra  ( experiment, sample, theta, phi, time, source, param_id, chunk_id, row )
+#   metrics  ( spectrum_id, name, value )
+#   params   ( processing parameters: WL range & step, smoothing, background )
+#   chunks   ( file, wavelength axis )
+#
+# with indexes on sample, experiment, ( theta, phi ), time and param_id, so a query
+# reads the index and the matching rows of the chunks, never the raw .dat files.
+# Appending the same spectra with the same parameters again replaces them.
+#
+#   archive = archivelib.Archive( 'results/archive' )
+#   result = archive.query( sample = 't30p60', metrics = ['aHR'] )
+#   table = archive.find( theta = 30, time = ( start, end ))
+
+import os, json, time, uuid, sqlite3, hashlib
+import numpy as np
+import pandas as pd
+import resultlib, anglib
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS params ( id INTEGER PRIMARY KEY, key TEXT UNIQUE, json TEXT );
+CREATE TABLE IF NOT EXISTS chunks ( id INTEGER PRIMARY KEY, file TEXT, n INTEGER, wl BLOB, wl_key TEXT, added REAL );
+CREATE TABLE IF NOT EXISTS spectra ( id INTEGER PRIMARY KEY, experiment TEXT, sample TEXT, theta REAL, phi REAL, time REAL,
+                                     source TEXT, param_id INTEGER, chunk_id INTEGER, row INTEGER, added REAL );
+CREATE TABLE IF NOT EXISTS metrics ( spectrum_id INTEGER, name TEXT, value REAL, PRIMARY KEY ( spectrum_id, name ));
+CREATE INDEX IF NOT EXISTS spectra_sample ON spectra ( sample );
+CREATE INDEX IF NOT EXISTS spectra_experiment ON spectra ( experiment );
+CREATE INDEX IF NOT EXISTS spectra_angle ON spectra ( theta, phi );
+CREATE INDEX IF NOT EXISTS spectra_time ON spectra ( time );
+CREATE INDEX IF NOT EXISTS spectra_param ON spectra ( param_id );
+CREATE INDEX IF NOT EXISTS spectra_source ON spectra ( source, param_id );
+CREATE INDEX IF NOT EXISTS metrics_name ON metrics ( name );
+'''
+# columns of find()
+META_COLUMNS = [ 'id', 'experiment', 'sample', 'theta', 'phi', 'time', 'source', 'param_id' ]
+
+def params_key( params ):
+    return hashlib.sha1( json.dumps( params, sort_keys = True, default = str ).encode( 'utf-8' )).hexdigest()
+
+class Archive:
+    """spectral archive in directory path (created if missing)"""
+    def __init__( self, path ):
+        self.path = path
+        self.chunk_dir = os.path.join( path, 'chunks' )
+        os.makedirs( self.chunk_dir, exist_ok = True )
+        db = self.connect()
+        try: db.executescript( SCHEMA )
+        finally: db.close()
+
+    def connect( self ):
+        # one connection per operation: several processes (ExpPL process pool) can append
+        return sqlite3.connect( os.path.join( self.path, 'archive.sqlite' ), timeout = 60 )
+
+    def param_id( self, db, params ):
+        key = params_key( params )
+        db.execute( 'INSERT OR IGNORE INTO params ( key, json ) VALUES ( ?, ? )', ( key, json.dumps( params, sort_keys = True, default = str )))
+        return db.execute( 'SELECT id FROM params WHERE key = ?', ( key, )).fetchone()[0]
+
+    def params( self ):
+        """{ param_id: processing parameters }"""
+        db = self.connect()
+        try: return { i: json.loads( p ) for i, p in db.execute( 'SELECT id, json FROM params' )}
+        finally: db.close()
+
+    def append( self, WL, spec, names, metrics, sources, times = None, params = None, experiment = None ):
+        """append spectra spec[n, WL] with names[n] (t##p## folders), metrics { name: values[n] }, source files[n] & times[n]: return spectrum ids"""
+        WL = np.asarray( WL, dtype = np.float64 )
+        n = len( names )
+        angle = anglib.angle_index( list( names ))
+        times = np.full( n, np.nan ) if times is None else np.asarray( times, dtype = np.float64 )
+        sources = [ os.path.abspath( s ) for s in sources ]
+        # - spectra are written to a new chunk before they are indexed
+        chunk_file = uuid.uuid4().hex + '.npy'
+        chunk = np.lib.format.open_memmap( os.path.join( self.chunk_dir, chunk_file ), mode = 'w+', dtype = np.float64, shape = ( n, len( WL )))
+        for start in range( 0, n, 1024 ):
+            chunk[start:start+1024] = spec[start:start+1024]
+        chunk.flush()
+        del chunk
+        now = time.time()
+        db = self.connect()
+        try:
+            with db:
+                param_id = self.param_id( db, params or {} )
+                self.remove( db, sources, param_id )
+                chunk_id = db.execute( 'INSERT INTO chunks ( file, n, wl, wl_key, added ) VALUES ( ?, ?, ?, ?, ? )',
+                                       ( chunk_file, n, WL.tobytes(), hashlib.sha1( WL.tobytes()).hexdigest(), now )).lastrowid
+                ids = []
+                for i in range( n ):
+                    ids.append( db.execute( 'INSERT INTO spectra ( experiment, sample, theta, phi, time, source, param_id, chunk_id, row, added ) VALUES ( ?, ?, ?, ?, ?, ?, ?, ?, ?, ? )',
+                                            ( experiment, str( names[i] ), nan_none( angle['theta'].iloc[i] ), nan_none( angle['phi'].iloc[i] ), nan_none( times[i] ),
+                                              sources[i], param_id, chunk_id, i, now )).lastrowid )
+                db.executemany( 'INSERT INTO metrics VALUES ( ?, ?, ? )',
+                                [ ( ids[i], name, nan_none( v )) for name, values in metrics.items() for i, v in enumerate( values ) ] )
+        finally:
+            db.close()
+        return ids
+
+    def remove( self, db, sources, param_id ):
+        # spectra of sources processed with param_id, and the chunks which are left empty
+        old = [ r for part in range( 0, len( sources ), 500 )
+                for r in db.execute( 'SELECT id, chunk_id FROM spectra WHERE param_id = ? AND source IN ({})'.format( ','.join( '?' * len( sources[part:part+500] ))),
+                                     [ param_id ] + sources[part:part+500] ) ]
+        if not old: return
+        db.executemany( 'DELETE FROM metrics WHERE spectrum_id = ?', [ ( i, ) for i, c in old ] )
+        db.executemany( 'DELETE FROM spectra WHERE id = ?', [ ( i, ) for i, c in old ] )
+        for chunk_id in set( c for i, c in old ):
+            if db.execute( 'SELECT 1 FROM spectra WHERE chunk_id = ? LIMIT 1', ( chunk_id, )).fetchone(): continue
+            chunk_file = db.execute( 'SELECT file FROM chunks WHERE id = ?', ( chunk_id, )).fetchone()[0]
+            db.execute( 'DELETE FROM chunks WHERE id = ?', ( chunk_id, ))
+            try: os.remove( os.path.join( self.chunk_dir, chunk_file ))
+            except OSError: pass
+
+    def where( self, experiment = None, sample = None, theta = None, phi = None, time = None, param_id = None, source = None ):
+        # SQL condition of the filters: value, list of values, or ( min, max ) of theta, phi & time
+        cond, args = [], []
+        for column, value in ( ( 'experiment', experiment ), ( 'sample', sample ), ( 'theta', theta ), ( 'phi', phi ),
+                               ( 'time', time ), ( 'param_id', param_id ), ( 'source', source )):
+            if value is None: continue
+            if isinstance( value, tuple ) and column in ( 'theta', 'phi', 'time' ):
+                cond.append( 's.{} BETWEEN ? AND ?'.format( column ))
+                args += list( value )
+            elif isinstance( value, ( list, set )):
+                value = list( value )
+                cond.append( 's.{} IN ({})'.format( column, ','.join( '?' * len( value ))))
+                args += value
+            else:
+                cond.append( 's.{} = ?'.format( column ))
+                args.append( value )
+        return ( ' WHERE ' + ' AND '.join( cond ) if cond else '' ), args
+
+    def select( self, db, metrics = None, **filters ):
+        # rows of the matching spectra & their metrics { name: values }
+        where, args = self.where( **filters )
+        rows = db.execute( 'SELECT s.id, s.experiment, s.sample, s.theta, s.phi, s.time, s.source, s.param_id, s.chunk_id, s.row FROM spectra s' + where + ' ORDER BY s.id', args ).fetchall()
+        ids = [ r[0] for r in rows ]
+        names = metrics
+        if names is None: names = [ r[0] for r in db.execute( 'SELECT DISTINCT name FROM metrics' ) ]
+        values = { name: np.full( len( ids ), np.nan ) for name in names }
+        if ids and names:
+            pos = { i: k for k, i in enumerate( ids )}
+            db.execute( 'CREATE TEMP TABLE IF NOT EXISTS selected ( id INTEGER PRIMARY KEY )' )
+            db.execute( 'DELETE FROM selected' )
+            db.executemany( 'INSERT INTO selected VALUES ( ? )', [ ( i, ) for i in ids ] )
+            query = 'SELECT m.spectrum_id, m.name, m.value FROM metrics m JOIN selected ON m.spectrum_id = selected.id WHERE m.name IN ({})'.format( ','.join( '?' * len( names )))
+            for spectrum_id, name, value in db.execute( query, list( names )):
+                if value is not None: values[name][pos[spectrum_id]] = value
+        return rows, values
+
+    def find( self, metrics = None, **filters ):
+        """metadata & metrics of the matching spectra as a DataFrame (no spectra are read)"""
+        db = self.connect()
+        try: rows, values = self.select( db, metrics, **filters )
+        finally: db.close()
+        table = pd.DataFrame( [ r[:len( META_COLUMNS )] for r in rows ], columns = META_COLUMNS )
+        for name, v in values.items(): table[name] = v
+        return table
+
+    def query( self, metrics = None, **filters ):
+        """matching spectra as a resultlib.SpecResult ( intensity[n, WL], sample names, metrics )
+
+        filters: experiment, sample, source, param_id (value or list), theta, phi, time (value, list or ( min, max ));
+        the spectra must share one wavelength axis (filter by param_id otherwise)"""
+        db = self.connect()
+        try:
+            rows, values = self.select( db, metrics, **filters )
+            chunk_ids = sorted( set( r[8] for r in rows ))
+            chunks = { c: db.execute( 'SELECT file, wl, wl_key FROM chunks WHERE id = ?', ( c, )).fetchone() for c in chunk_ids }
+        finally:
+            db.close()
+        if not rows: return resultlib.SpecResult( np.empty( 0 ), np.empty( ( 0, 0 )), [], values )
+        if len( set( c[2] for c in chunks.values())) > 1:
+            raise ValueError( 'Spectra of the query are on {} wavelength axes, filter by param_id'.format( len( set( c[2] for c in chunks.values()))))
+        WL = np.frombuffer( next( iter( chunks.values()))[1], dtype = np.float64 )
+        spec = np.empty( ( len( rows ), len( WL )))
+        chunk_of = np.array( [ r[8] for r in rows ])
+        row_of = np.array( [ r[9] for r in rows ])
+        # - one memory map per chunk, gather of its matching rows
+        for c in chunk_ids:
+            sel = np.flatnonzero( chunk_of == c )
+            spec[sel] = np.load( os.path.join( self.chunk_dir, chunks[c][0] ), mmap_mode = 'r' )[row_of[sel]]
+        return resultlib.SpecResult( WL, spec, [ r[2] for r in rows ], values )
+
+def nan_none( value ):
+    # SQLite NULL of missing values
+    if value is None: return None
+    value = float( value )
+    return None if np.isnan( value ) else value
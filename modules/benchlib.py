@@ -0,0 +1,229 @@
+###############################
+#   Benchmark                 #
+###############################
+
+# Synthetic Ocean Optics data trees and per-stage timing of the ExpPL pipeline.
+#
+#   $ python modules/benchlib.py --sets 2 --angles 49 --acq 3 --out bench.json --compare last.json
+#
+# Each stage records wall time, throughput (spectra/s) and, with --memory, the peak of
+# traced memory. The JSON result can be compared with a previous run (--compare).
+# --imports adds the import time of exppl and lab_exppl in fresh interpreters, and the
+# visualization packages (bokeh, seaborn, ...) which the import pulled in.
+
+import os, sys, io, json, time, platform, argparse, tempfile, shutil, tracemalloc, subprocess
+from contextlib import redirect_stdout
+import numpy as np
+import pandas as pd
+
+sys.path.insert( 0, os.path.dirname( os.path.abspath( __file__ )))
+import speclib, smoothlib
+
+# wavelength calibration of the example spectrometer (2048 pixels, 28-1075 nm)
+CALIBRATION = [ -1.06094524e-09, -7.23046719e-05, 6.63648136e-01, 2.83696788e+01 ]
+N_PIXEL = 2048
+SUMMARY_WL = list( range( 400, 851, 50 ))
+
+###############################
+#   Synthetic Data            #
+###############################
+
+def synthetic_wavelength( n_pixel = N_PIXEL ):
+    return np.polyval( CALIBRATION, np.arange( n_pixel ))
+
+def synthetic_counts( wl, rng, amplitude = 5000, peak = 560, hr = 0.6, width = 12, dark = 10 ):
+    # vibronic progression (0-0, 0-1, 0-2) with Poisson-like noise, dark counts and a laser line
+    counts = np.zeros_like( wl )
+    for n, factor in enumerate( [ 1, hr, hr**2 / 2 ] ):
+        counts += amplitude * factor * np.exp( -0.5 * (( wl - peak - 42 * n ) / width ) ** 2 )
+    counts += 3 * amplitude * np.exp( -0.5 * (( wl - 405 ) / 1.5 ) ** 2 )
+    counts += dark + rng.normal( 0, 1, len( wl )) * np.sqrt( counts + dark )
+    return np.round( np.clip( counts, 0.0001, None ), 4 )
+
+def write_spectrum( fpath, wl, counts ):
+    with open( fpath, 'w', newline = '' ) as outfile:
+        outfile.write( ''.join( '{}\t{:.5f}\t{:.4f}\r\n'.format( i, w, c ) for i, ( w, c ) in enumerate( zip( wl, counts ))))
+
+def write_summary( fpath, rows ):
+    with open( fpath, 'w', newline = '' ) as outfile:
+        outfile.write( 'Time(msec)\t' + ''.join( 'Counts@{}nm\t'.format( w ) for w in SUMMARY_WL ) + '\r\n' )
+        for spec_id, values in rows:
+            outfile.write( '{}\t'.format( spec_id ) + ''.join( '{:.3f}\t'.format( v ) for v in values ) + '\r\n' )
+
+def angle_names( n_angles ):
+    # t##p## names of add_angle: theta & phi in 15 degree steps
+    names = [ 't{:02d}p{:02d}'.format( t, p ) for t in range( 0, 91, 15 ) for p in range( 0, 91, 15 ) ]
+    while len( names ) < n_angles:
+        names += [ n + 'r{}'.format( len( names ) // 49 ) for n in names[:49] ]
+    return names[:n_angles]
+
+def make_data_set( set_dir, n_angles, n_acq, rng, wl ):
+    os.makedirs( set_dir, exist_ok = True )
+    for name in angle_names( n_angles ):
+        spec_dir = os.path.join( set_dir, name )
+        os.makedirs( spec_dir, exist_ok = True )
+        rows, t = [], int( rng.integers( 1000, 30000 ))
+        amplitude = rng.uniform( 1000, 6000 )
+        for i in range( n_acq ):
+            counts = synthetic_counts( wl, rng, amplitude = amplitude * rng.uniform( 0.5, 1 ), peak = rng.uniform( 555, 565 ), hr = rng.uniform( 0.5, 0.7 ))
+            write_spectrum( os.path.join( spec_dir, '{}.dat'.format( t )), wl, counts )
+            rows.append( ( t, np.interp( SUMMARY_WL, wl, counts )))
+            t += 1232
+        write_summary( spec_dir + '.dat', rows )
+
+def make_tree( root, n_sets = 1, n_angles = 8, n_acq = 3, seed = 0 ):
+    """synthetic tree: root/background/bg(.dat) and root/data/set##/t##p##(.dat); return ( background path, data path )"""
+    rng = np.random.default_rng( seed )
+    wl = synthetic_wavelength()
+    bg_dir = os.path.join( root, 'background', 'bg' )
+    os.makedirs( bg_dir, exist_ok = True )
+    rows = []
+    for t in ( 3697, 4929 ):
+        counts = np.round( np.clip( 10 + rng.normal( 0, 3, len( wl )), 0.0001, None ), 4 )
+        write_spectrum( os.path.join( bg_dir, '{}.dat'.format( t )), wl, counts )
+        rows.append( ( t, np.interp( SUMMARY_WL, wl, counts )))
+    write_summary( bg_dir + '.dat', rows )
+    for i in range( n_sets ):
+        make_data_set( os.path.join( root, 'data', 'set{:02d}'.format( i )), n_angles, n_acq, rng, wl )
+    return os.path.join( root, 'background', '' ), os.path.join( root, 'data', '' )
+
+###############################
+#   Stage Timing              #
+###############################
+
+class StageTimer:
+    def __init__( self, fg_memory = False ):
+        self.fg_memory = fg_memory
+        self.stages = {}
+
+    def run( self, name, n_spectra, func, *args, **kwargs ):
+        if self.fg_memory: tracemalloc.start()
+        start = time.perf_counter()
+        with redirect_stdout( io.StringIO()):
+            result = func( *args, **kwargs )
+        elapsed = time.perf_counter() - start
+        peak = None
+        if self.fg_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        stage = self.stages.setdefault( name, { 'time': 0.0, 'spectra': 0, 'peak_memory': None } )
+        stage['time'] += elapsed
+        stage['spectra'] += n_spectra
+        if peak is not None: stage['peak_memory'] = max( stage['peak_memory'] or 0, peak )
+        return result
+
+    def summary( self ):
+        for stage in self.stages.values():
+            stage['throughput'] = stage['spectra'] / stage['time'] if stage['time'] > 0 else None
+        return self.stages
+
+def bench_data_set( exp_pl, timer, set_dir, bg_spec ):
+    spec_dat_path = timer.run( 'read_dat_path', 0, exp_pl.read_dat_path, os.path.join( set_dir, '' ))
+    n = len( spec_dat_path )
+    if not n: return
+    timer.stages['read_dat_path']['spectra'] += n
+    # component stages of read_data
+    raw = timer.run( 'read_spectra', n, lambda: [ exp_pl.read_raw_array( p ) for p in spec_dat_path ] )
+    for ind, wl, counts in speclib.stack_spectra( *zip( *raw )):
+        counts = timer.run( 'spec_smooth', len( ind ), lambda: smoothlib.smooth( counts if bg_spec is None else bg_spec.subtract( wl, counts ), exp_pl.smo_win, exp_pl.smo_kernel ))
+        WL = speclib.wavelength_grid( exp_pl.WL_min, exp_pl.WL_max, exp_pl.WL_step )
+        mask = speclib.strip_mask( wl, exp_pl.WL_min, exp_pl.WL_max )
+        spec = timer.run( 'interpolate_spec', len( ind ), lambda: np.clip( speclib.resample( wl[mask], counts[:, mask], WL ), 0, None ))
+        timer.run( 'metrics', len( ind ), lambda: ( speclib.normalize( spec ), speclib.integral( spec ),
+                                                    speclib.spec_shift_coef( spec, WL, exp_pl.WL_peak ), speclib.hr_factor( spec, WL, exp_pl.aHR_range )))
+    # end to end
+    processed = timer.run( 'read_data', n, exp_pl.read_data, spec_dat_path, bg_spec )
+    fg_save, exp_pl.fg_save = exp_pl.fg_save, False
+    result = timer.run( 'merge_data', n, exp_pl.merge_data, *processed, spec_dat_path )
+    exp_pl.fg_save = fg_save
+    if fg_save:
+        SpecAll, NorSpecAll = result.to_frames()
+        timer.run( 'save_spectrum', n, exp_pl.save_spectrum, SpecAll, NorSpecAll, processed[2], os.path.dirname( spec_dat_path[0] ))
+
+# packages which the compute core must not load
+HEAVY_MODULES = ( 'bokeh', 'seaborn', 'matplotlib', 'scipy' )
+
+def import_time( module = 'exppl', repeat = 5 ):
+    """import time of module in fresh interpreters: { 'time': best, 'median', 'loaded': heavy packages imported }"""
+    code = ( 'import sys, time; sys.path.insert( 0, {!r} ); t = time.perf_counter(); import {}; t = time.perf_counter() - t; '
+             'print( t ); print( " ".join( m for m in {!r} if m in sys.modules ))' ).format( os.path.dirname( os.path.abspath( __file__ )), module, HEAVY_MODULES )
+    times = []
+    for _ in range( repeat ):
+        out = subprocess.run( [ sys.executable, '-c', code ], capture_output = True, text = True, check = True ).stdout.splitlines()
+        times.append( float( out[0] ))
+    loaded = out[1].split() if len( out ) > 1 else []
+    return { 'time': min( times ), 'median': float( np.median( times )), 'loaded': loaded }
+
+def run_benchmark( n_sets = 1, n_angles = 8, n_acq = 3, root = None, export_format = 'xlsx', fg_save = True, fg_cache = False, fg_memory = False, seed = 0, fg_imports = False ):
+    """generate a synthetic tree (or reuse root) and time every stage of the pipeline"""
+    from exppl import ExpPL
+    tmp = None
+    if root is None: root = tmp = tempfile.mkdtemp( prefix = 'exppl-bench-' )
+    try:
+        start = time.perf_counter()
+        if not os.path.isdir( os.path.join( root, 'data' )):
+            make_tree( root, n_sets, n_angles, n_acq, seed )
+        generate = time.perf_counter() - start
+        bg_path, data_path = os.path.join( root, 'background', '' ), os.path.join( root, 'data', '' )
+        exp_pl = ExpPL( [500, 700], bg_path = bg_path, fg_save = fg_save, fg_plot = False, WL_SSC_split = 560, aHR_range = [550, 570, 590, 610],
+                        smo_win = 10, fg_cache = fg_cache, cache_dir = os.path.join( root, 'cache' ), export_format = export_format )
+        timer = StageTimer( fg_memory )
+        imports = {}
+        if fg_imports:
+            for module in ( 'exppl', 'lab_exppl' ):
+                imports[module] = import_time( module )
+                timer.stages['import_' + module] = { 'time': imports[module]['time'], 'spectra': 0, 'peak_memory': None }
+        bg_spec = timer.run( 'read_background', 1, exp_pl.read_background )
+        set_dirs = sorted( os.path.join( data_path, d ) for d in os.listdir( data_path ))
+        for set_dir in set_dirs:
+            bench_data_set( exp_pl, timer, set_dir, bg_spec )
+        return {
+            'timestamp': time.strftime( '%Y-%m-%dT%H:%M:%S' ),
+            'config': { 'sets': n_sets, 'angles': n_angles, 'acq': n_acq, 'export_format': export_format, 'fg_save': fg_save, 'fg_cache': fg_cache },
+            'environment': { 'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__, 'machine': platform.machine() },
+            'n_spectra': timer.stages.get( 'read_data', {} ).get( 'spectra', 0 ),
+            'generate_time': generate,
+            'stages': timer.summary(),
+            'imports': imports,
+        }
+    finally:
+        if tmp: shutil.rmtree( tmp, ignore_errors = True )
+
+def compare( result, previous ):
+    """print time ratio (current / previous) of every stage"""
+    print( '{:<18}{:>12}{:>12}{:>9}'.format( 'stage', 'time (s)', 'prev (s)', 'ratio' ))
+    for name, stage in result['stages'].items():
+        prev = previous.get( 'stages', {} ).get( name )
+        if prev and prev['time']:
+            print( '{:<18}{:>12.4f}{:>12.4f}{:>9.2f}'.format( name, stage['time'], prev['time'], stage['time'] / prev['time'] ))
+        else:
+            print( '{:<18}{:>12.4f}{:>12}{:>9}'.format( name, stage['time'], '-', '-' ))
+
+def main( argv = None ):
+    parser = argparse.ArgumentParser( description = 'Benchmark of the ExpPL pipeline on synthetic Ocean Optics data' )
+    parser.add_argument( '--sets', type = int, default = 1, help = 'number of data sets' )
+    parser.add_argument( '--angles', type = int, default = 8, help = 'number of t##p## folders per data set' )
+    parser.add_argument( '--acq', type = int, default = 3, help = 'acquisitions per folder' )
+    parser.add_argument( '--root', default = None, help = 'directory of the synthetic tree (kept; reused if it exists)' )
+    parser.add_argument( '--format', default = 'xlsx', help = 'export format' )
+    parser.add_argument( '--no-save', action = 'store_true', help = 'skip save_spectrum' )
+    parser.add_argument( '--cache', action = 'store_true', help = 'enable spectrum & result caches' )
+    parser.add_argument( '--memory', action = 'store_true', help = 'record peak memory (tracemalloc) per stage' )
+    parser.add_argument( '--imports', action = 'store_true', help = 'time the import of exppl & lab_exppl in fresh interpreters' )
+    parser.add_argument( '--out', default = None, help = 'write result to JSON file' )
+    parser.add_argument( '--compare', default = None, help = 'JSON result of a previous run' )
+    args = parser.parse_args( argv )
+
+    result = run_benchmark( args.sets, args.angles, args.acq, args.root, args.format, not args.no_save, args.cache, args.memory, fg_imports = args.imports )
+    if args.out:
+        with open( args.out, 'w' ) as outfile:
+            json.dump( result, outfile, indent = 2 )
+    if args.compare:
+        with open( args.compare ) as infile:
+            compare( result, json.load( infile ))
+    else:
+        print( json.dumps( result, indent = 2 ))
+    return result
+
+if __name__ == '__main__':
+    main()
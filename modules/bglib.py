@@ -0,0 +1,93 @@
+###############################
+#   Background Model          #
+###############################
+
+# Dark spectra of ExpPL. A background is built once per run from the frames of a
+# background tree: the brightest frame of the first summary file (method 'brightest',
+# the legacy behaviour) or every frame of every summary averaged pixel by pixel
+# ('mean', 'median' or 'sigma': mean after rejecting frames further than nsigma robust
+# standard deviations from the median, e.g. cosmic rays). Built backgrounds are cached
+# on ( frame files, method, nsigma ).
+#
+# bg_path = [ before, after ] gives one background per tree; each spectrum is corrected
+# with the background linearly interpolated at its file time, so a drifting dark level
+# is followed through the run. Backgrounds are aligned (resampled) once per wavelength
+# calibration and subtracted from a whole batch ( n_spectra x n_pixels ) in one operation.
+
+import os
+import numpy as np
+import speclib, datlib, cachelib
+
+METHODS = ( 'brightest', 'mean', 'median', 'sigma' )
+
+def average_frames( counts, method = 'mean', nsigma = 3 ):
+    """average of frames counts[n, pixel] per pixel: 'mean', 'median' or 'sigma' (mean of the frames within nsigma robust std of the median)"""
+    counts = np.asarray( counts, dtype = np.float64 )
+    if method == 'median': return np.median( counts, axis = 0 )
+    if method != 'sigma' or len( counts ) < 3: return counts.mean( axis = 0 )
+    med = np.median( counts, axis = 0 )
+    # - robust std: 1.4826 * median absolute deviation
+    sigma = 1.4826 * np.median( np.abs( counts - med ), axis = 0 )
+    keep = np.abs( counts - med ) <= nsigma * sigma
+    n_keep = keep.sum( axis = 0 )
+    return np.where( n_keep > 0, ( counts * keep ).sum( axis = 0 ) / np.maximum( n_keep, 1 ), med )
+
+def frame_time( paths ):
+    # acquisition time of frames: median modification time (s)
+    return float( np.median( [ os.stat( p ).st_mtime_ns for p in paths ] )) / 1e9
+
+def build_background( paths, method = 'mean', nsigma = 3, fg_cache = True, cache_dir = None ):
+    """background of frame files paths: return ( time, wavelength, counts ) with counts >= 0"""
+    if method not in METHODS:
+        raise ValueError( 'Unknown background method \'{}\', use one of {}'.format( method, METHODS ))
+    key = ( 'background', tuple( cachelib.file_fingerprint( p ) for p in paths ), method, nsigma )
+    cache = cachelib.result_cache if fg_cache else None
+    entry = cache.get( key ) if cache is not None else None
+    if entry is None:
+        groups = speclib.stack_spectra( *zip( *[ datlib.read_dat( p, fg_cache, cache_dir ) for p in paths ] ))
+        # - frames of other calibrations are resampled onto the most common one
+        groups.sort( key = lambda g: -len( g[0] ))
+        wl = groups[0][1]
+        counts = np.vstack( [ c if np.array_equal( w, wl ) else speclib.resample( w, c, wl ) for i, w, c in groups ] )
+        bg = np.clip( average_frames( counts, method, nsigma ), 0, None )
+        entry = np.vstack( [ wl, bg ] )
+        if cache is not None: cache.put( key, entry )
+    return frame_time( paths ), entry[0], entry[1]
+
+class Background:
+    """backgrounds of a run ( time, wavelength, counts ), subtracted with linear interpolation in time"""
+    def __init__( self, entries ):
+        entries = sorted( entries, key = lambda e: e[0] )
+        self.times = np.array( [ e[0] for e in entries ], dtype = np.float64 )
+        # - wavelength calibration of the first background; the others are resampled onto it
+        self.wl = np.asarray( entries[0][1], dtype = np.float64 )
+        self.counts = np.vstack( [ c if np.array_equal( w, self.wl ) else speclib.resample( w, c[None], self.wl )[0] for t, w, c in entries ] )
+        self.key = cachelib.array_fingerprint( np.concatenate( [ self.times, self.wl, self.counts.ravel() ] ))
+        # aligned backgrounds per calibration fingerprint
+        self.aligned = {}
+
+    def __len__( self ):
+        return len( self.times )
+
+    def align( self, wl ):
+        """backgrounds[n_bg, pixel] on calibration wl (cached)"""
+        key = cachelib.array_fingerprint( wl )
+        if key not in self.aligned:
+            wl = np.asarray( wl, dtype = np.float64 )
+            same = wl.shape == self.wl.shape and np.array_equal( wl, self.wl )
+            self.aligned[key] = self.counts if same else speclib.resample( self.wl, self.counts, wl )
+        return self.aligned[key]
+
+    def at( self, wl, times = None ):
+        """background on calibration wl: counts[pixel], or counts[n, pixel] interpolated at times[n] (s)"""
+        counts = self.align( wl )
+        if len( self ) == 1 or times is None: return counts[0]
+        # - bracketing backgrounds and weight of each time (held constant outside the run)
+        ind = np.clip( np.searchsorted( self.times, times, side = 'right' ), 1, len( self ) - 1 )
+        lo, hi = self.times[ind-1], self.times[ind]
+        weight = np.clip( ( np.asarray( times, dtype = np.float64 ) - lo ) / np.where( hi > lo, hi - lo, 1 ), 0, 1 )
+        return counts[ind-1] + ( counts[ind] - counts[ind-1] ) * weight[:, None]
+
+    def subtract( self, wl, counts, times = None ):
+        """counts[n, pixel] minus background, negative intensity set to 0"""
+        return speclib.sub_background( counts, self.at( wl, times ))
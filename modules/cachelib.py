@@ -0,0 +1,58 @@
+###############################
+#   Result Cache              #
+###############################
+
+# In-memory LRU cache of processed spectra and derived metrics. Processed spectra are
+# keyed on (file fingerprint, background fingerprint, smo_win, smo_kernel, WL_range,
+# WL_step) and metrics on (spectra keys, metric parameters), so changing a metric
+# parameter only recomputes the metric, and changing smo_win only re-processes the spectra.
+
+import os, hashlib, threading
+from collections import OrderedDict
+import numpy as np
+
+def file_fingerprint( fpath ):
+    stat = os.stat( fpath )
+    return ( os.path.abspath( fpath ), stat.st_mtime_ns, stat.st_size )
+
+def array_fingerprint( arr ):
+    if arr is None: return None
+    return hashlib.sha1( np.ascontiguousarray( arr, dtype = np.float64 ).tobytes()).hexdigest()
+
+class LRUCache:
+    """least recently used cache of numpy arrays, limited by total size (bytes)"""
+    def __init__( self, max_bytes = 512 * 2**20 ):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__( self ):
+        return len( self.data )
+
+    def get( self, key, default = None ):
+        with self.lock:
+            if key not in self.data: return default
+            self.data.move_to_end( key )
+            return self.data[key]
+
+    def put( self, key, value ):
+        size = getattr( value, 'nbytes', 64 )
+        if size > self.max_bytes: return
+        with self.lock:
+            if key in self.data:
+                self.nbytes -= getattr( self.data.pop( key ), 'nbytes', 64 )
+            self.data[key] = value
+            self.nbytes += size
+            # evict least recently used
+            while self.nbytes > self.max_bytes:
+                k, v = self.data.popitem( last = False )
+                self.nbytes -= getattr( v, 'nbytes', 64 )
+
+    def clear( self ):
+        with self.lock:
+            self.data.clear()
+            self.nbytes = 0
+
+# shared by all ExpPL instances (and survives re-running %run exppl.py in a notebook)
+result_cache = LRUCache()
@@ -1,10 +1,13 @@
 import numpy as np
-import seaborn as sns
+
+# seaborn is imported by the palettes which need it, so the fixed palettes load with numpy only
 
 def cw_color( color_cnt ):
+    import seaborn as sns
     return sns.color_palette("coolwarm", color_cnt ).as_hex()
 
 def qcolor10( color_cnt ):
+    import seaborn as sns
     return sns.color_palette("hls", color_cnt ).as_hex()
 
 def qcolor20( color_cnt ):
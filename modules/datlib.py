@@ -0,0 +1,146 @@
+###############################
+#   Ocean Optics .dat Reader  #
+###############################
+
+# Spectrum files are 3 tab separated columns without header: pixel, wavelength, counts.
+# Parsed spectra are cached as binary .npy files keyed on (path, mtime, size) of the
+# text file, so the next read is a memory map instead of a text parse. Summary files
+# of a tree are indexed in one SQLite catalog per tree (SummaryCatalog).
+
+import os, hashlib, shutil, sqlite3
+import numpy as np
+
+CACHE_DIR = os.path.join( os.path.expanduser( '~' ), '.cache', 'exppl' )
+
+def parse_dat( fpath ):
+    """parse spectrum file and return ( wavelength, counts ) as float64 arrays"""
+    with open( fpath, 'rb' ) as infile:
+        data = np.array( infile.read().split(), dtype = np.float64 )
+    if data.size % 3:
+        raise ValueError( 'Spectrum file is not in 3 columns (pixel, wavelength, counts): ' + fpath )
+    data = data.reshape( -1, 3 )
+    return data[:, 1].copy(), data[:, 2].copy()
+
+def cache_key( fpath, fingerprint = None ):
+    # fingerprint: ( path, mtime_ns, size ) of a previous stat (e.g. the tree index), so the file is not stat'ed again
+    if fingerprint is None:
+        stat = os.stat( fpath )
+        fingerprint = ( os.path.abspath( fpath ), stat.st_mtime_ns, stat.st_size )
+    key = '{}|{}|{}'.format( *fingerprint )
+    return hashlib.sha1( key.encode( 'utf-8' )).hexdigest()
+
+def cache_path( fpath, cache_dir = None, fingerprint = None ):
+    key = cache_key( fpath, fingerprint )
+    return os.path.join( cache_dir or CACHE_DIR, key[:2], key + '.npy' )
+
+def write_cache( cpath, wl, counts ):
+    # write to temporary file first so a concurrent reader never sees a partial cache
+    try:
+        os.makedirs( os.path.dirname( cpath ), exist_ok = True )
+        tmp = '{}.{}.tmp'.format( cpath, os.getpid() )
+        with open( tmp, 'wb' ) as outfile:
+            np.save( outfile, np.vstack( [wl, counts] ))
+        os.replace( tmp, cpath )
+    except OSError:
+        pass
+
+def read_dat( fpath, fg_cache = True, cache_dir = None, fingerprint = None ):
+    """read spectrum file: return ( wavelength, counts ); use (and fill) the binary cache if fg_cache"""
+    if not fg_cache: return parse_dat( fpath )
+    cpath = cache_path( fpath, cache_dir, fingerprint )
+    # - a missing cache file fails the load, without a stat first
+    try:
+        data = np.load( cpath, mmap_mode = 'r' )
+        return data[0], data[1]
+    except ( OSError, ValueError ):
+        pass
+    wl, counts = parse_dat( fpath )
+    write_cache( cpath, wl, counts )
+    return wl, counts
+
+def clear_cache( cache_dir = None ):
+    shutil.rmtree( cache_dir or CACHE_DIR, ignore_errors = True )
+
+###############################
+#   Summary Files             #
+###############################
+
+# Summary file <dir>.dat: header 'Time(msec) Counts@400nm ... Counts@850nm', one row per
+# acquisition; Time(msec) is also the file name of the spectrum in <dir>/.
+
+def parse_summary( fpath ):
+    """parse summary file and return ( header, spectrum id[n], values[n, counts] )"""
+    with open( fpath, 'r' ) as infile:
+        header, _, body = infile.read().partition( '\n' )
+    header = header.split()
+    tokens = np.array( body.split())
+    if tokens.size % len( header ):
+        raise ValueError( 'Summary file has rows of different length: ' + fpath )
+    tokens = tokens.reshape( -1, len( header ))
+    return header, tokens[:, 0], tokens[:, 1:].astype( np.float64 )
+
+class SummaryCatalog:
+    """persistent index of the parsed summary files in a measurement tree (SQLite), invalidated by mtime & size"""
+    def __init__( self, par_dir, fg_cache = True, cache_dir = None ):
+        self.fg_cache = fg_cache
+        self.db = None
+        if fg_cache:
+            key = hashlib.sha1( os.path.abspath( par_dir ).encode( 'utf-8' )).hexdigest()
+            self.catalog_path = os.path.join( cache_dir or CACHE_DIR, 'catalog', key + '.sqlite' )
+            try:
+                os.makedirs( os.path.dirname( self.catalog_path ), exist_ok = True )
+                # - data sets of a tree may be read by several processes at a time
+                self.db = sqlite3.connect( self.catalog_path, timeout = 60 )
+                self.db.execute( 'CREATE TABLE IF NOT EXISTS summary ( path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, header TEXT, id TEXT, nrow INTEGER, ncol INTEGER, data BLOB )' )
+            except sqlite3.Error:
+                self.db = None
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc ):
+        self.close()
+
+    def close( self ):
+        if self.db is not None:
+            try: self.db.commit()
+            except sqlite3.Error: pass
+            self.db.close()
+            self.db = None
+
+    def read( self, fpath ):
+        """return ( header, spectrum id[n], values[n, counts] ) of a summary file"""
+        return next( self.read_all( [fpath] ))
+
+    def rows( self, paths ):
+        # catalog entries of absolute paths: { path: row }
+        rows = {}
+        for start in range( 0, len( paths ), 500 ):
+            part = paths[start:start+500]
+            query = 'SELECT path, mtime, size, header, id, nrow, ncol, data FROM summary WHERE path IN ({})'.format( ','.join( '?' * len( part )))
+            rows.update( ( r[0], r[1:] ) for r in self.db.execute( query, part ))
+        return rows
+
+    def read_all( self, fpaths, mapper = map ):
+        """( header, spectrum id[n], values[n, counts] ) of every summary file in order
+
+        mapper( func, fpaths ) runs the stat & parse of the files, e.g. on a prefetching thread pool (prefetchlib);
+        the catalog is only queried and updated by the calling thread"""
+        paths = [ os.path.abspath( f ) for f in fpaths ]
+        rows = self.rows( paths ) if self.db is not None else {}
+        def load( path ):
+            stat = os.stat( path )
+            row = rows.get( path )
+            if row and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+                header, ids = row[2].split( '\t' ), np.array( row[3].split( '\t' ) if row[4] else [] )
+                return None, ( header, ids, np.frombuffer( row[6], dtype = np.float64 ).reshape( row[4], row[5] ))
+            return stat, parse_summary( path )
+        for path, ( stat, entry ) in zip( paths, mapper( load, paths )):
+            if stat is not None and self.db is not None:
+                header, ids, values = entry
+                try:
+                    self.db.execute( 'INSERT OR REPLACE INTO summary VALUES ( ?, ?, ?, ?, ?, ?, ?, ? )',
+                                     ( path, stat.st_mtime_ns, stat.st_size, '\t'.join( header ), '\t'.join( ids ), values.shape[0], values.shape[1], values.tobytes() ))
+                except sqlite3.Error:
+                    pass
+            yield entry
@@ -0,0 +1,78 @@
+###############################
+#   Exporters                 #
+###############################
+
+# Every exporter takes the base path of the result (without extension), the spectra
+# matrix (wavelength x spectra), the per-spectrum metrics table and the XLSX sheets.
+# The columnar formats write the spectra matrix and the metrics table as they are;
+# XLSX keeps the sheet layout for Excel users. The spectra matrix is None when the spectra
+# were already written to a memory-mapped store (out-of-core mode). The optional packages
+# of a format (REQUIRES) are checked by get_exporter, before any data is processed.
+
+from concurrent.futures import ThreadPoolExecutor
+import importlib.util
+import pandas as pd
+
+def export_xlsx( base_path, spectrum, metrics, sheets ):
+    export_fname = base_path + '.xlsx'
+    with pd.ExcelWriter( export_fname ) as export_xlsx:
+        for sheet_name, data in sheets.items():
+            data.to_excel( export_xlsx, sheet_name = sheet_name )
+    return [ export_fname ]
+
+def columnar_table( data ):
+    # columnar formats need string column names and a plain index column
+    data = data.rename_axis( data.index.name or 'Spectrum' ).reset_index()
+    data.columns = [ str( c ) for c in data.columns ]
+    return data
+
+def export_parquet( base_path, spectrum, metrics, sheets ):
+    export_fname = [ base_path + '.spectrum.parquet', base_path + '.metrics.parquet' ]
+    if spectrum is not None: columnar_table( spectrum ).to_parquet( export_fname[0], index = False )
+    columnar_table( metrics ).to_parquet( export_fname[1], index = False )
+    return export_fname if spectrum is not None else export_fname[1:]
+
+def export_feather( base_path, spectrum, metrics, sheets ):
+    export_fname = [ base_path + '.spectrum.feather', base_path + '.metrics.feather' ]
+    if spectrum is not None: columnar_table( spectrum ).to_feather( export_fname[0] )
+    columnar_table( metrics ).to_feather( export_fname[1] )
+    return export_fname if spectrum is not None else export_fname[1:]
+
+def export_hdf5( base_path, spectrum, metrics, sheets ):
+    export_fname = base_path + '.h5'
+    with pd.HDFStore( export_fname, mode = 'w' ) as store:
+        if spectrum is not None: store.put( 'spectrum', columnar_table( spectrum ), format = 'fixed' )
+        store.put( 'metrics', columnar_table( metrics ), format = 'fixed' )
+    return [ export_fname ]
+
+EXPORTERS = { 'xlsx': export_xlsx, 'parquet': export_parquet, 'feather': export_feather, 'hdf5': export_hdf5 }
+
+# packages of the formats (any one of them)
+REQUIRES = { 'parquet': ( 'pyarrow', 'fastparquet' ), 'feather': ( 'pyarrow', ), 'hdf5': ( 'tables', ) }
+
+def register_exporter( fmt, exporter, requires = () ):
+    EXPORTERS[fmt] = exporter
+    if requires: REQUIRES[fmt] = tuple( requires )
+
+def get_exporter( fmt ):
+    """exporter of fmt; raise ImportError if its optional package is not installed"""
+    try:
+        exporter = EXPORTERS[fmt.lower()]
+    except KeyError:
+        raise ValueError( 'Unknown export format \'{}\', use one of {}'.format( fmt, sorted( EXPORTERS )))
+    requires = REQUIRES.get( fmt.lower(), () )
+    if requires and not any( importlib.util.find_spec( m ) for m in requires ):
+        raise ImportError( 'Export format \'{}\' needs {} (pip install {})'.format( fmt, ' or '.join( requires ), requires[0] ))
+    return exporter
+
+###############################
+#   Background Export         #
+###############################
+
+# one writer thread, so the exports of successive data sets are written in order
+_executor = None
+
+def submit( func, *args ):
+    global _executor
+    if _executor is None: _executor = ThreadPoolExecutor( max_workers = 1, thread_name_prefix = 'export' )
+    return _executor.submit( func, *args )
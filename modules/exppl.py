@@ -1,28 +1,74 @@
 import pandas as pd
-import os, sys, warnings
+import os, sys, warnings, io, hashlib
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pickle import PicklingError
 import numpy as np
 
-from bokeh.models import ColumnDataSource, Legend
-from bokeh.plotting import figure, gridplot, show
-
 from fpathlib import getDatDirPath
-from colorlib import qcolor20
+import fpathlib
+import speclib, smoothlib, bglib, fitlib, resultlib, prefetchlib, archivelib, plotlib, metriclib, anglib, datlib, cachelib, exportlib, instrlib
+from instrlib import staged
+import logging
+from watchlib import FolderWatcher
+
+# sheet names of the phi-sorted metrics (angular analysis)
+SPT_SHEETS = { 'SpecShiftCoef': 'SPT_SSC', 'aHR': 'SPT_aHR', 'IntSpec': 'SPT_IntSpec' }
 
 class ExpPL:
-    def __init__( self, WL_range = [0,0], bg_path = None, fg_save = True, fg_legend = True, fg_plot = True, WL_SSC_split = None, pSSC_yrange = [0.3, 0.7], aHR_range = None, smo_win = 5 ):
+    def __init__( self, WL_range = [0,0], bg_path = None, fg_save = True, fg_legend = True, fg_plot = True, WL_SSC_split = None, pSSC_yrange = [0.3, 0.7], aHR_range = None, smo_win = 5, smo_kernel = 'triang', WL_step = 1, fg_cache = True, cache_dir = None, export_format = 'xlsx', fg_async_export = False, fg_verbose = True, log_callback = None, fg_memory = False, fg_out_of_core = False, chunk_size = 256, fg_light_plot = False, plot_points = 500, plot_downsample = 'lttb', fg_float32 = False, metrics = None, fg_ang = False, bg_method = 'brightest', bg_sigma = 3, scan_threads = 1, fg_fit = False, fit_vib = 0.18, fit_n_vib = 4, io_threads = 4, prefetch_depth = 16, archive = None ):
+        # diagnostics: messages, stage timers & counters (fg_verbose: print messages)
+        self.instr = instrlib.Instrument( fg_verbose, log_callback, fg_memory )
         # initialize: min wavelength (WL_min), max wavelength (WL_max), peak wavelength (WL_peak)
         self.WL_min, self.WL_max = WL_range
         self.init_check()
-        # path of background spectra
+        # path of background spectra, or [ before, after ] paths of a run (interpolated in time)
         self.bg_path = bg_path
+        # - frames of background: 'brightest' (of the first summary file), or every frame averaged by 'mean', 'median' or 'sigma' (clipped at bg_sigma)
+        self.bg_method = bg_method
+        self.bg_sigma = bg_sigma
         # flag of saving spectrum
         self.fg_save = fg_save
+        # - spectral archive (directory): results of every data set are appended to archivelib.Archive( archive )
+        self.archive = archive
+        # - export format (xlsx, parquet, feather, hdf5) & export on a background thread
+        self.export_format = export_format
+        # - unknown format or missing package: fail before any data is processed
+        exportlib.get_exporter( export_format )
+        self.fg_async_export = fg_async_export
+        self.export_jobs = []
         # - pectral Shift Coefficient
         self.WL_peak = WL_SSC_split
         # - range of apparent H-R factor
         self.aHR_range = aHR_range
+        # - metrics besides SpecShiftCoef, aHR & IntSpec (names of metriclib.METRICS, e.g. 'PeakWL', 'FWHM', 'Centroid')
+        self.metrics = list( metrics or [] )
+        # - vibronic fit: Huang-Rhys factor, 0-0 energy, vibronic energy & width (fitlib.FIT_METRICS)
+        #   from fit_vib (initial vibronic energy, eV) and fit_n_vib vibronic bands
+        self.fit_vib = fit_vib
+        self.fit_n_vib = fit_n_vib
+        if fg_fit: self.metrics += [ m for m in fitlib.FIT_METRICS if m not in self.metrics ]
+        # angular analysis: theta/phi columns & phi-sorted sheets of t##p## folders
+        self.fg_ang = fg_ang
         # - smooth window of data frame
         self.smo_win = smo_win
+        # - smoothing kernel: 'triang' (default), 'gaussian' or 'savgol' (see smoothlib)
+        self.smo_kernel = smo_kernel
+        # - out-of-core: process chunk_size spectra at a time into a memory-mapped store
+        self.fg_out_of_core = fg_out_of_core
+        self.chunk_size = chunk_size
+        # - wavelength step of interpolated spectrum
+        self.WL_step = WL_step
+        # - binary cache of parsed spectrum files
+        self.fg_cache = fg_cache
+        self.cache_dir = cache_dir
+        # - index of the scanned trees { root: fpathlib.TreeIndex } (scan_threads: threads of a scan)
+        self.scan_threads = scan_threads
+        self.trees = {}
+        # - prefetching reader: io_threads threads read up to prefetch_depth files ahead of the processing (io_threads <= 1: serial)
+        self.io_threads = io_threads
+        self.prefetch_depth = prefetch_depth
         # == plotting ==
         # - flag
         self.fg_plot = fg_plot
@@ -30,233 +76,443 @@ class ExpPL:
         self.fg_legend = fg_legend
         # - y range of spectral shift coefficient
         self.pSSC_yrange = pSSC_yrange
+        # - lightweight plotting: one multi_line source of the drawn spectra, downsampled to plot_points
+        #   ( plot_downsample: 'lttb', 'minmax' or None ) and optionally sent as float32
+        self.fg_light_plot = fg_light_plot
+        self.plot_points = plot_points
+        self.plot_downsample = plot_downsample
+        self.fg_float32 = fg_float32
 
     def init_check( self ):
         if self.WL_min == self.WL_max:
-            print( 'self.WL_min == self.WL_max', str( self.WL_min ))
+            self.instr.log( 'self.WL_min == self.WL_max', str( self.WL_min ), level = logging.WARNING )
         elif self.WL_min > self.WL_max:
-            print( 'self.WL_min ({}) > self.WL_max ({})'.format( str( self.WL_min ), str( self.WL_max )))
+            self.instr.log( 'self.WL_min ({}) > self.WL_max ({})'.format( str( self.WL_min ), str( self.WL_max )), level = logging.WARNING )
 
     def find_index_MaxValList( self, sum_val ):
         """find highest intensity spectra in summary list and return its index of list"""
-        max_ind = -1
-        max_tmp = 0
-        for i, values in enumerate( sum_val ):
-            if ( max( values ) > max_tmp ):
-                max_ind = i
-                max_tmp = max( values )
+        sum_max = np.asarray( sum_val, dtype = np.float64 ).max( axis = 1, initial = 0 )
+        max_ind = int( np.argmax( sum_max )) if len( sum_max ) else -1
+        # no spectrum with positive counts
+        if max_ind < 0 or sum_max[max_ind] <= 0: return -1
         return max_ind
 
     def interpolate_spec( self, spec ):
-        # interpolate WL[self.WL_min-1:self.WL_max]
-        # - redinx: insert index to data frame and the intensity remains Nan
-        spec_ix = list( range( self.WL_min, self.WL_max + 1 ))
-        specRI = spec.reindex( index = pd.Index( sorted( set( spec_ix + list( spec.index )))))
-        # - linear interpoloate based on the wavelength
-        specRI.interpolate( method = 'index', inplace = True )
-        # - spectrum: range[self.WL_min, 1, self.WL_max]
-        spec_strip = specRI.ix[spec_ix]
-        spec_strip.index.rename( 'Wavelength', inplace = True )
-        return spec_strip
+        # interpolate WL[self.WL_min:self.WL_step:self.WL_max] with the cached weights of the wavelength calibration
+        WL = speclib.wavelength_grid( self.WL_min, self.WL_max, self.WL_step )
+        spec_strip = speclib.resample( spec.index.values, spec.values.T, WL ).T
+        return pd.DataFrame( spec_strip, index = pd.Index( WL, name = 'Wavelength' ), columns = spec.columns )
 
     def calSpecShiftCoef( self, spec ):
         if self.aHR_range:
             # Spectrum Shift Coefficient
-            spec_sp = spec['Intensity'][:self.WL_peak-self.WL_min+1].tolist()
-            spec_pe = spec['Intensity'][self.WL_peak-self.WL_min+1:].tolist()
-            # S = [I(>WL_peak) - I(<WL_peak)] / I(WL_min-WL_max)
-            spec_shift_coef = ( (sum(spec_pe) - sum(spec_sp)) / spec['Intensity'].sum())
-            return spec_shift_coef
+            return speclib.spec_shift_coef( spec[['Intensity']].values.T, spec.index.values, self.WL_peak )[0]
 
     def calHR_factor( self, spec ):
         if self.aHR_range:
             # Apparent H-R factor
-            main = spec['Intensity'][self.aHR_range[0]-self.WL_min:self.aHR_range[1]-self.WL_min].tolist()
-            shoulder = spec['Intensity'][self.aHR_range[2]-self.WL_min:self.aHR_range[3]-self.WL_min].tolist()
-            # H-R factor = max(soulder_peak) / max(main_peak)
-            return max( shoulder ) / max( main )
-
-    def read_dat_path( self, par_dir ):
+            return speclib.hr_factor( spec[['Intensity']].values.T, spec.index.values, self.aHR_range )[0]
+
+    def scan_tree( self, par_dir, fg_refresh = False ):
+        """index of the tree of par_dir: scanned once (persisted with fg_cache) and shared by the path queries of a run"""
+        tree = next( ( t for t in self.trees.values() if t.covers( par_dir )), None )
+        if tree is None:
+            index_dir = os.path.join( self.cache_dir or datlib.CACHE_DIR, 'tree' ) if self.fg_cache else None
+            tree = fpathlib.TreeIndex( par_dir, self.scan_threads, index_dir )
+            # - a tree replaces the trees of its subdirectories
+            self.trees = { root: t for root, t in self.trees.items() if not tree.covers( root )}
+            self.trees[tree.root] = tree
+        elif fg_refresh: tree.refresh( par_dir )
+        else: return tree
+        self.instr.count( 'dirs_scanned', tree.n_scanned )
+        return tree
+
+    def read_summary( self, par_dir ):
         # read summary file
         # - path: summary file
-        path = [ ( d + '.dat', d ) for d in getDatDirPath( par_dir ) if os.path.isfile( d + '.dat' )]
-        if not path: print('No Summary File in', par_dir )
+        tree = self.scan_tree( par_dir )
+        path = [ ( d + '.dat', d ) for d in getDatDirPath( par_dir, tree, self.instr.warn ) if tree.isfile( d + '.dat' )]
+        if not path: self.instr.log( 'No Summary File in', par_dir, level = logging.WARNING )
+        self.instr.count( 'summary_files', len( path ))
         #print('path:', path )
 
+        # - one catalog of the scanned tree, shared by all its data sets
+        with datlib.SummaryCatalog( tree.root, self.fg_cache, self.cache_dir ) as catalog:
+            # - read summary files (or their catalog entries) ahead of the selection of the spectra
+            for ( fpath, dir_path ), ( header, spec_id, sum_val ) in zip( path, catalog.read_all( [ p for p, d in path ], self.prefetch )):
+                yield fpath, dir_path, spec_id, sum_val
+
+    def read_dat_path( self, par_dir ):
+        """spectrum file of the brightest acquisition of every folder in par_dir (the tree of par_dir is scanned again)"""
+        self.scan_tree( par_dir, fg_refresh = True )
+        return self.select_dat_path( par_dir )
+
+    @staged( 'read_dat_path' )
+    def select_dat_path( self, par_dir ):
+        # read_dat_path from the scanned tree, which the entry point has just refreshed
         spec_dat_path = []
-        for fpath, dir_path in path:
-            # - open & read summary file: find index of highest intesnity spectra
-            with open( fpath, 'r' ) as infile:
-                summary = [ s.split() for s in infile.readlines() ]
-                if len( summary ) == 1: 
-                    print('\tWARNING: No Spectra Data in Summary File.\n\tSummary File:', fpath, '\n\tFolder:', dir_path )
-                    continue
-                sum_val = [ [ float(ss) for ss in s ][1:] for s in summary[1:] ]
-                # find index of highest intesnity spectra
-                max_ind = self.find_index_MaxValList( sum_val )
-                # set file path of highest intensity spectra
-                spec_dat_path.append( os.path.join( dir_path, summary[max_ind+1][0] + '.dat' ))
+        for fpath, dir_path, spec_id, sum_val in self.read_summary( par_dir ):
+            # find index of highest intesnity spectra
+            max_ind = self.find_index_MaxValList( sum_val ) if len( spec_id ) else -1
+            if max_ind < 0:
+                self.instr.log( '\tWARNING: No Spectra Data in Summary File.\n\tSummary File:', fpath, '\n\tFolder:', dir_path, level = logging.WARNING )
+                self.instr.count( 'spectra_dropped' )
+                continue
+            # set file path of highest intensity spectra
+            spec_dat_path.append( os.path.join( dir_path, spec_id[max_ind] + '.dat' ))
         #print( 'dat path:', spec_dat_path)
         return spec_dat_path
 
+    def read_time_series_path( self, par_dir ):
+        """every acquisition of every folder: return [ ( folder, Time(msec)[n], spectrum file path[n] ), ... ] (the tree of par_dir is scanned again)"""
+        self.scan_tree( par_dir, fg_refresh = True )
+        return self.select_time_series_path( par_dir )
+
+    @staged( 'read_time_series_path' )
+    def select_time_series_path( self, par_dir ):
+        # read_time_series_path from the scanned tree
+        series = []
+        for fpath, dir_path, spec_id, sum_val in self.read_summary( par_dir ):
+            spec_path = [ os.path.join( dir_path, s + '.dat' ) for s in spec_id ]
+            tree = self.scan_tree( dir_path )
+            exist = np.array( [ tree.isfile( p ) for p in spec_path ], dtype = bool )
+            self.instr.count( 'spectra_dropped', int(( ~exist ).sum()))
+            if not exist.any():
+                self.instr.log( '\tWARNING: No Spectra Data in Summary File.\n\tSummary File:', fpath, '\n\tFolder:', dir_path, level = logging.WARNING )
+                continue
+            times = np.array( [ float( s ) if s.replace( '.', '', 1 ).isdigit() else np.nan for s in spec_id ] )[exist]
+            series.append( ( dir_path, times, [ p for p, e in zip( spec_path, exist ) if e ] ))
+        return series
+
     def spec_smooth( self, spec ):
-        return spec.rolling( window = self.smo_win, min_periods = 1, center = True, win_type = 'triang', closed = 'both' ).mean()
+        smoothed = smoothlib.smooth( spec.values.T, self.smo_win, self.smo_kernel ).T
+        return pd.DataFrame( smoothed, index = spec.index, columns = spec.columns )
     
-    def read_spectra( self, infile, bg_spec = None, fg_smooth = True ):
-        spec = pd.read_table( infile, header = None, usecols = [1, 2], dtype = np.float64, index_col = 0 )
+    def read_spectra( self, fpath, bg_spec = None, fg_smooth = True ):
+        wl, counts = datlib.read_dat( fpath, self.fg_cache, self.cache_dir )
+        spec = pd.DataFrame( np.array( counts ), index = np.array( wl ))
         # substract background if background path exist (self.bg_path)
         spec = self.sub_background( spec, bg_spec )
         # smooth
         if fg_smooth:
             spec = self.spec_smooth( spec )
             # strip laser light
-            spec = spec[ self.WL_min-1 : self.WL_max+1 ]
+            spec = spec.loc[ self.WL_min-1 : self.WL_max+1 ]
         spec.columns = ['Intensity']
         return spec
 
     def read_raw_data( self, fpath, bg_spec = None, fg_smooth = True ):
-        print( 'dat:', '/'.join( fpath.split( os.sep )[-2:] ))
-        with open( fpath, 'r' ) as infile:
-            spec = self.read_spectra( infile, bg_spec = bg_spec, fg_smooth = fg_smooth )
-            # interpolated spectra WL[WL_min-WL_max, step = 1]
-            spec = self.interpolate_spec( spec )
-            spec.where( spec.values >= 0, other = 0, inplace = True )
+        self.instr.log( 'dat:', '/'.join( fpath.split( os.sep )[-2:] ), level = logging.DEBUG )
+        spec = self.read_spectra( fpath, bg_spec = bg_spec, fg_smooth = fg_smooth )
+        # interpolated spectra WL[WL_min-WL_max, step = WL_step]
+        spec = self.interpolate_spec( spec )
+        spec.where( spec.values >= 0, other = 0, inplace = True )
         return spec
 
+    @staged( 'read_background' )
     def read_background( self ):
-        if self.bg_path:
-            print('== READ BACKGROUND ==')
-            bgpath = self.read_dat_path( self.bg_path )[0]
-            print( 'dat:', '/'.join( bgpath.split( os.sep )[-2:] ))
-            with open( bgpath, 'r' ) as infile:
-                bg = self.read_spectra( infile, fg_smooth = False )
-                bg.where( bg.values >= 0, other = 0, inplace = True )
-            print('=====================')
-            return bg
-        return None
+        """background of bg_path: return bglib.Background (None without bg_path)"""
+        if not self.bg_path: return None
+        self.instr.log( '== READ BACKGROUND ==' )
+        bg_paths = [ self.bg_path ] if isinstance( self.bg_path, str ) else list( self.bg_path )
+        bg = bglib.Background( [ self.read_background_frames( p ) for p in bg_paths ] )
+        self.instr.log( '=====================' )
+        return bg
+
+    def read_background_frames( self, bg_path ):
+        # background ( time, wavelength, counts ) of the frames of one background tree
+        self.scan_tree( bg_path, fg_refresh = True )
+        if self.bg_method == 'brightest':
+            frames = self.select_dat_path( bg_path )[:1]
+        else:
+            frames = [ p for dir_path, times, spec_path in self.select_time_series_path( bg_path ) for p in spec_path ]
+        if not frames: raise FileNotFoundError( 'No background spectrum in {}'.format( bg_path ))
+        for fpath in frames:
+            self.instr.log( 'dat:', '/'.join( fpath.split( os.sep )[-2:] ), level = logging.DEBUG )
+        self.instr.count( 'files_read', len( frames ))
+        return bglib.build_background( frames, self.bg_method, self.bg_sigma, self.fg_cache, self.cache_dir )
 
     def sub_background( self, spec, bg_spec ):
-        try:
-            spec = spec.sub( bg_spec['Intensity'].values, axis = 0 )
-            return spec.where( spec.values >= 0, other = 0 )
-        except TypeError:
-            return spec
+        if bg_spec is None: return spec
+        return pd.DataFrame( bg_spec.subtract( spec.index.values, spec.values.T ).T, index = spec.index, columns = spec.columns )
+
+    def read_raw_array( self, fpath, fingerprint = None ):
+        # ( wavelength, counts ) of a spectrum file; runs on the prefetching threads, so it does not log
+        return datlib.read_dat( fpath, self.fg_cache, self.cache_dir, fingerprint )
+
+    def fingerprints( self, spec_dat_path ):
+        # ( path, mtime, size ) of the files from the scanned trees; files outside the trees are stat'ed on the prefetching pool
+        fingerprints = [None] * len( spec_dat_path )
+        for i, fpath in enumerate( spec_dat_path ):
+            fpath = os.path.abspath( fpath )
+            stat = next( ( s for s in ( t.stat( fpath ) for t in self.trees.values()) if s is not None ), None )
+            if stat is not None: fingerprints[i] = ( fpath, stat[1], stat[0] )
+        missing = [ i for i, f in enumerate( fingerprints ) if f is None ]
+        for i, fingerprint in zip( missing, self.prefetch( cachelib.file_fingerprint, [ spec_dat_path[i] for i in missing ] )):
+            fingerprints[i] = fingerprint
+        return fingerprints
+
+    def prefetch( self, func, items ):
+        # func of every item in order, on the prefetching thread pool
+        return prefetchlib.prefetch( func, items, self.io_threads, self.prefetch_depth )
+
+    def result_cache( self, fg_result_cache = True ):
+        # shared cache of processed spectra & metrics, None if it is not used
+        return cachelib.result_cache if self.fg_cache and fg_result_cache else None
+
+    def read_batch( self, spec_dat_path, bg_spec, fg_result_cache = True ):
+        # read all spectra and process them as (n_spectra x n_pixels) arrays, one array per wavelength calibration
+        # - processed spectra are cached on ( file, background, smo_win, smo_kernel, WL_range, WL_step )
+        params = ( None if bg_spec is None else bg_spec.key, self.smo_win, self.smo_kernel, self.WL_min, self.WL_max, self.WL_step )
+        keys = [ ( fingerprint, *params ) for fingerprint in self.fingerprints( spec_dat_path ) ]
+        cache = self.result_cache( fg_result_cache )
+        spec = [ cache.get( key ) for key in keys ] if cache is not None else [None] * len( keys )
+        miss = [ i for i, s in enumerate( spec ) if s is None ]
+        self.instr.count( 'spectra', len( keys ))
+        self.instr.count( 'spectra_cached', len( keys ) - len( miss ))
+        self.instr.count( 'files_read', len( miss ))
+        self.instr.count( 'bytes_read', sum( keys[i][0][2] for i in miss ))
+        # - files are read ahead on the prefetching pool while the previous block of chunk_size spectra is processed
+        raw = self.prefetch( lambda i: self.read_raw_array( spec_dat_path[i], keys[i][0] ), miss )
+        for block, block_raw in zip( prefetchlib.blocks( miss, self.chunk_size ), prefetchlib.blocks( raw, self.chunk_size )):
+            # - messages of the files in order, from the consumer
+            for i in block:
+                self.instr.log( 'dat:', '/'.join( spec_dat_path[i].split( os.sep )[-2:] ), level = logging.DEBUG )
+            for ind, wl, counts in speclib.stack_spectra( *zip( *block_raw )):
+                # - background of the calibration, interpolated at the file time of each spectrum
+                bg = None if bg_spec is None else bg_spec.at( wl, np.array( [ keys[block[i]][0][1] for i in ind ] ) / 1e9 )
+                WL, spec_grp = speclib.process_batch( wl, counts, bg, [ self.WL_min, self.WL_max ], self.smo_win, step = self.WL_step, kernel = self.smo_kernel )
+                for i, s in zip( ind, spec_grp ):
+                    spec[block[i]] = s.copy()
+                    if cache is not None: cache.put( keys[block[i]], spec[block[i]] )
+        WL = speclib.wavelength_grid( self.WL_min, self.WL_max, self.WL_step )
+        return WL, np.vstack( spec ), keys
+
+    def cal_metric( self, name, func, spec, WL, keys, params, fg_result_cache = True ):
+        # metrics of a batch are cached on ( metric, spectra, parameters )
+        cache = self.result_cache( fg_result_cache )
+        key = ( name, tuple( keys ), params )
+        values = cache.get( key ) if cache is not None else None
+        if values is None:
+            values = func( spec, WL, *params )
+            if cache is not None: cache.put( key, values )
+        return values.tolist()
+
+    @staged( 'read_data' )
+    def read_arrays( self, spec_dat_path, bg_spec ):
+        """processed spectra & metrics of a batch: return ( wavelength, spectra[n, wavelength], { metric: values } )"""
+        WL, spec, keys = self.read_batch( spec_dat_path, bg_spec )
+        return WL, spec, self.cal_metrics( spec, WL, keys )
 
     def read_data( self, spec_dat_path, bg_spec ):
-        # read spectra & strip the redundant wavelength
-        Spec, NorSpec, IntSpec, spec_shift_coef, aHR_factor = [[], [], [], [], []]
-        for fpath in spec_dat_path:
-            # read spectra
-            spec = self.read_raw_data( fpath, bg_spec )
-            Spec.append( spec )
-            # normalized spectra
-            NorSpec.append( spec / spec.max())
-            # integral intensity
-            IntSpec.append( spec['Intensity'].sum())
-            # calculate spectra shift coefficient
-            spec_shift_coef.append( self.calSpecShiftCoef( spec ))
-            # calculate apparent H-R factor
-            aHR_factor.append( self.calHR_factor( spec ))
-        return Spec, NorSpec, IntSpec, spec_shift_coef, aHR_factor
+        # read spectra & strip the redundant wavelength: one DataFrame per spectrum
+        WL, spec, metrics = self.read_arrays( spec_dat_path, bg_spec )
+        index = pd.Index( WL, name = 'Wavelength' )
+        Spec = [ pd.DataFrame( {'Intensity': s }, index = index ) for s in spec ]
+        # normalized spectra
+        NorSpec = [ pd.DataFrame( {'Intensity': s }, index = index ) for s in speclib.normalize( spec ) ]
+        return Spec, NorSpec, metrics
+
+    def metric_names( self ):
+        return list( metriclib.BUILTIN_METRICS ) + [ m for m in self.metrics if m not in metriclib.BUILTIN_METRICS ]
+
+    def export_metric_names( self ):
+        return list( metriclib.EXPORT_METRICS ) + [ m for m in self.metric_names() if m not in metriclib.EXPORT_METRICS ]
+
+    def cal_metrics( self, spec, WL, keys, fg_result_cache = True ):
+        """run every metric stage over the batch: return { metric: values }"""
+        metrics = {}
+        for name in self.metric_names():
+            func, params = metriclib.get_metric( name )
+            params = [ getattr( self, p ) for p in params ]
+            # - metric without its parameter (e.g. aHR without aHR_range)
+            if any( p is None for p in params ): metrics[name] = [None] * len( spec )
+            else: metrics[name] = self.cal_metric( name, func, spec, WL, keys, tuple( tuple( p ) if isinstance( p, list ) else p for p in params ), fg_result_cache )
+        return metrics
 
     def sort_phi( self, indata ):
-        data = pd.DataFrame( indata, copy=True  )
-        data.sort_values( ['phi', 'theta'], inplace = True )
-        return data
+        return indata.sort_values( ['phi', 'theta'], kind = 'stable' )
 
     def add_angle( self, data ):
-        angle = [ aa for a in data.index.tolist() for aa in a.split() if 't' in aa and 'p' in aa ]
-        if angle:
-            data['theta'] = [ float( a[1:3] ) for a in angle ]
-            data['phi_rad'], data['phi'] = [ float( a[4:6] )*np.pi/180 for a in angle ], [ float( a[4:6] ) for a in angle ]
-        else:
-            data['theta'] = [ float(aa[1:]) for a in data.index.tolist() for aa in a.split() if 't' in aa ]
-            data['phi'] = [ float(aa[1:]) for a in data.index.tolist() for aa in a.split() if 'p' in aa ]
-            data['phi_rad'] = [ a * np.pi / 180 for a in data['phi']]
-        return data
+        # theta, phi_rad & phi of the t##p## names of the index, parsed in one pass (anglib)
+        return anglib.angle_table( data )
 
-    def get_save_path( self, sp_par_dir ):
-        return os.path.join( '', *[ *sp_par_dir[0:-2], sp_par_dir[-2] + '.xlsx'] )
+    def angular_map( self, metrics, name, step = 1, method = 'linear' ):
+        """metric name of a metrics table with angles interpolated over the hemisphere: return ( theta[i], phi[j], values[i, j] )"""
+        if 'theta' not in metrics.columns: metrics = self.add_angle( metrics )
+        return anglib.hemisphere_grid( metrics['theta'], metrics['phi'], metrics[name], step, method )
 
-    def save_spectrum( self, SpecAll, NorSpecAll, IntSpec, spec_shift_coef, aHR_factor, par_dir ):
-        # Save results as XLSX file:
+    def get_save_path( self, sp_par_dir, ext = '.xlsx' ):
+        return os.path.join( os.sep.join( sp_par_dir[0:-2] ), sp_par_dir[-2] + ext )
+
+    @staged( 'save_spectrum' )
+    def save_spectrum( self, SpecAll, NorSpecAll, metrics, par_dir ):
+        # Save results as XLSX file (or export_format):
         # - setup file path of results
         sp_par_dir = par_dir.split( os.sep )
-        export_fname = self.get_save_path( sp_par_dir )
-        print( 'Exported Spectrum:', export_fname )
-        # - convert spec_shift_coef to pandas.DataFrame
-        SpecShiftCoef = pd.DataFrame( {'SpecShiftCoef': spec_shift_coef }, index = SpecAll.columns )
-        # - convert aHR_factor to pandas.DataFrame
-        aHR_Factor = pd.DataFrame( {'aHR': aHR_factor }, index = SpecAll.columns )
-        # - convert IntSpec to pandas.DataFrame
-        IntegralSpec = pd.DataFrame( {'IntSpec': IntSpec }, index = SpecAll.columns )
-
-        with pd.ExcelWriter( export_fname ) as export_xlsx:
-            SpecAll.to_excel( export_xlsx, sheet_name = 'Spectrum' )
-            NorSpecAll.to_excel( export_xlsx, sheet_name = 'NormalizedSpec' )
-            SpecShiftCoef.to_excel( export_xlsx, sheet_name = 'SpecShiftCoef' )
-            aHR_Factor.to_excel( export_xlsx, sheet_name = 'aHR' )
-            IntegralSpec.to_excel( export_xlsx, sheet_name = 'IntSpec' )
-            export_xlsx.save()
+        export_base = self.get_save_path( sp_par_dir, ext = '' )
+        # - metrics table of all spectra & one sheet per metric
+        metrics = pd.DataFrame( metrics, index = SpecAll.columns, columns = self.export_metric_names())
+        # - angles are parsed once per data set and shared by all sheets
+        if self.fg_ang: metrics = self.add_angle( metrics )
+        angle = anglib.ANGLE_COLUMNS if self.fg_ang else []
+        sheets = { 'Spectrum': SpecAll, 'NormalizedSpec': NorSpecAll }
+        sheets.update( { name: metrics[[name] + angle] for name in self.export_metric_names() } )
+        if self.fg_ang:
+            # - one phi-sorted table for all SPT_* sheets
+            metrics_phi = self.sort_phi( metrics )
+            sheets.update( { SPT_SHEETS.get( name, 'SPT_' + name ): metrics_phi[[name] + angle] for name in self.export_metric_names() } )
+        self.export( export_base, SpecAll, metrics, sheets )
+
+    def export( self, export_base, SpecAll, metrics, sheets ):
+        exporter = exportlib.get_exporter( self.export_format )
+        if self.fg_async_export:
+            self.instr.log( 'Exporting Spectrum ({}):'.format( self.export_format ), export_base )
+            self.export_jobs.append( exportlib.submit( exporter, export_base, SpecAll, metrics, sheets ))
+        else:
+            for export_fname in exporter( export_base, SpecAll, metrics, sheets ):
+                self.instr.log( 'Exported Spectrum:', export_fname )
+
+    def wait_export( self ):
+        """wait for the background exports and return the exported files"""
+        export_fname = [ f for job in self.export_jobs for f in job.result() ]
+        self.export_jobs = []
+        return export_fname
 
     def spec_column_name( self, spec_dat_path ):
         return [ p.split( os.sep )[-2] for p in spec_dat_path ]
         
-    def merge_data( self, Spec, NorSpec, IntSpec, spec_shift_coef, aHR_factor, spec_dat_path ):
-        # concatenate dataframe of spectrum
-        # - create column name for raw and normalized intensity
-        specColName = self.spec_column_name( spec_dat_path )
-        NorSpecColName = [ 'Nor ' + s for s in specColName ]
-        # - joint all raw and normalized spectrum
-        SpecAll = pd.concat( Spec, axis = 1 )
-        NorSpecAll = pd.concat( NorSpec, axis = 1 )
-        # - update column names
-        SpecAll.columns = specColName
-        NorSpecAll.columns = NorSpecColName
-
-        # - joint raw & normalized spectrum
-        spectrum = pd.concat( [SpecAll, NorSpecAll], axis = 1 )
-        # - joint spectrum, integraled intensity, spectral shfit, apparent H-R factor
-        index = [ v + self.WL_min for v in range( len( specColName ))]
-        spectrum['SpecShiftCoef'] = pd.Series( spec_shift_coef, index = index )
-        spectrum['IntSpec'] = pd.Series( IntSpec, index = index )
-        spectrum['aHR'] = pd.Series( aHR_factor, index = index )
-
-        # export result
+    def merge_data( self, Spec, NorSpec, metrics, spec_dat_path ):
+        """merge the spectra of read_data into a resultlib.SpecResult (normalized spectra are recomputed on use)"""
+        spec = np.vstack( [ s['Intensity'].values for s in Spec ] )
+        return self.make_result( Spec[0].index.values, spec, metrics, spec_dat_path )
+
+    @staged( 'merge_data' )
+    def make_result( self, WL, spec, metrics, spec_dat_path ):
+        # result of a data set & export
+        result = resultlib.SpecResult( WL, spec, self.spec_column_name( spec_dat_path ), metrics )
         if self.fg_save:
-            self.save_spectrum( SpecAll, NorSpecAll, IntSpec, spec_shift_coef, aHR_factor, os.path.dirname( spec_dat_path[0] ))
-
-        return spectrum, specColName, NorSpecColName
+            SpecAll, NorSpecAll = result.to_frames()
+            self.save_spectrum( SpecAll, NorSpecAll, metrics, os.path.dirname( spec_dat_path[0] ))
+        if self.archive: self.archive_spectrum( WL, spec, metrics, spec_dat_path )
+        return result
+
+    def processing_params( self ):
+        # parameters of the processed spectra & metrics (archive index)
+        return { 'WL_range': [ self.WL_min, self.WL_max ], 'WL_step': self.WL_step, 'smo_win': self.smo_win, 'smo_kernel': self.smo_kernel,
+                 'bg_path': self.bg_path, 'bg_method': self.bg_method, 'bg_sigma': self.bg_sigma, 'WL_SSC_split': self.WL_peak, 'aHR_range': self.aHR_range }
+
+    @staged( 'archive' )
+    def archive_spectrum( self, WL, spec, metrics, spec_dat_path ):
+        """append the spectra of a data set to the archive: acquisition time from the tree index (file mtime)"""
+        tree = self.scan_tree( os.path.dirname( spec_dat_path[0] ))
+        times = [ ( tree.stat( p ) or [ 0, os.stat( p ).st_mtime_ns ] )[1] / 1e9 for p in spec_dat_path ]
+        experiment = os.path.dirname( os.path.dirname( os.path.abspath( spec_dat_path[0] )))
+        archivelib.Archive( self.archive ).append( WL, spec, self.spec_column_name( spec_dat_path ), metrics, spec_dat_path, times,
+                                                   self.processing_params(), experiment )
+
+    def read_result( self, spec_dat_path, bg_spec ):
+        """read_data & merge_data without the per-spectrum DataFrames: return resultlib.SpecResult"""
+        return self.make_result( *self.read_arrays( spec_dat_path, bg_spec ), spec_dat_path )
+
+    def get_store_path( self, par_dir ):
+        # memory-mapped store of processed spectra: next to the export, or in the cache directory
+        if self.fg_save: return self.get_save_path( par_dir.split( os.sep ), ext = '.spectrum.npy' )
+        key = hashlib.sha1( os.path.abspath( par_dir ).encode( 'utf-8' )).hexdigest()
+        store_dir = os.path.join( self.cache_dir or datlib.CACHE_DIR, 'store' )
+        os.makedirs( store_dir, exist_ok = True )
+        return os.path.join( store_dir, key + '.npy' )
+
+    @staged( 'read_data_chunked' )
+    def read_data_chunked( self, spec_dat_path, bg_spec ):
+        """out-of-core read_data: write processed spectra chunk by chunk into a memory-mapped .npy store; return ( wavelength, store, metrics )"""
+        par_dir = os.path.dirname( spec_dat_path[0] )
+        WL = speclib.wavelength_grid( self.WL_min, self.WL_max, self.WL_step )
+        store_path = self.get_store_path( par_dir )
+        store = np.lib.format.open_memmap( store_path, mode = 'w+', dtype = np.float64, shape = ( len( spec_dat_path ), len( WL )))
+        metrics = {}
+        # - chunks bypass the shared result cache, so memory does not grow with the number of spectra
+        for start in range( 0, len( spec_dat_path ), self.chunk_size ):
+            WL, spec, keys = self.read_batch( spec_dat_path[start:start+self.chunk_size], bg_spec, fg_result_cache = False )
+            store[start:start+len( spec )] = spec
+            for name, chunk_values in self.cal_metrics( spec, WL, keys, fg_result_cache = False ).items():
+                metrics.setdefault( name, [] ).extend( chunk_values )
+            store.flush()
+            del spec
+        if self.archive: self.archive_spectrum( WL, store, metrics, spec_dat_path )
+        metrics = pd.DataFrame( metrics, index = self.spec_column_name( spec_dat_path ), columns = self.export_metric_names())
+        if self.fg_ang: metrics = self.add_angle( metrics )
+        if self.fg_save:
+            export_base = self.get_save_path( par_dir.split( os.sep ), ext = '' )
+            np.save( export_base + '.wavelength.npy', WL )
+            self.instr.log( 'Exported Spectrum:', store_path )
+            self.export( export_base, None, metrics, { 'Metrics': metrics } )
+        return WL, store, metrics
+
+    @staged( 'read_time_series' )
+    def read_time_series( self, dir_path, spec_path, times, bg_spec ):
+        """all acquisitions of a folder as a ( time x wavelength ) cube, processed chunk_size spectra at a time"""
+        WL = speclib.wavelength_grid( self.WL_min, self.WL_max, self.WL_step )
+        cube = np.empty( ( len( spec_path ), len( WL )))
+        metrics = {}
+        for start in range( 0, len( spec_path ), self.chunk_size ):
+            WL, spec, keys = self.read_batch( spec_path[start:start+self.chunk_size], bg_spec )
+            cube[start:start+len( spec )] = spec
+            for name, chunk_values in self.cal_metrics( spec, WL, keys ).items():
+                metrics.setdefault( name, [] ).extend( chunk_values )
+        metrics = pd.DataFrame( metrics, index = pd.Index( times, name = 'Time(msec)' ), columns = self.export_metric_names())
+        if self.fg_save:
+            sp_par_dir = dir_path.split( os.sep )
+            export_base = self.get_save_path( [ *sp_par_dir, '' ], ext = '.timeseries' )
+            spectrum = pd.DataFrame( cube.T, index = pd.Index( WL, name = 'Wavelength' ), columns = times )
+            self.export( export_base, spectrum, metrics, { 'Spectrum': spectrum, 'Metrics': metrics } )
+        return WL, cube, metrics
+
+    def time_series_folder( self, dir_path ):
+        """time-series mode: every acquisition of every folder in dir_path; return { folder: ( wavelength, cube[time, wavelength], metrics ) }"""
+        self.instr.folder = dir_path
+        self.scan_tree( dir_path, fg_refresh = True )
+        series = self.select_time_series_path( os.path.join( dir_path, '' ))
+        bg_spec = self.read_background()
+        return { os.path.basename( d ): self.read_time_series( d, spec_path, times, bg_spec ) for d, times, spec_path in series }
 
     def get_processed_spec( self, spec_dat_path, bg_spec ):
-        return self.merge_data( *self.read_data( spec_dat_path, bg_spec ), spec_dat_path )
-
-    def config_plot( self, spectrum ):
-        # plotting
+        if self.fg_out_of_core: return self.read_data_chunked( spec_dat_path, bg_spec )
+        return self.read_result( spec_dat_path, bg_spec )
+
+    def config_plot( self, n_spec, spectrum = None ):
+        # plotting: bokeh & palettes are imported on the first plot, so the compute core loads without them
+        from bokeh.models import ColumnDataSource
+        from bokeh.plotting import figure
+        from colorlib import qcolor20
         # - figure configuration
-        plot_config = dict( plot_height = 300, toolbar_location = 'left' )
-        N = int( len(spectrum.columns) / 2 )
-        if N < 5: N = 5
+        plot_config = dict( height = 300, toolbar_location = 'left' )
+        N = max( n_spec, 5 )
         colors = qcolor20( N )
 
         # - set figure source
-        source = ColumnDataSource( data = spectrum )
+        # - the lightweight path builds its own sources of the drawn columns
+        source = ColumnDataSource( data = spectrum ) if spectrum is not None else None
         # - create figure
         if not self.fg_legend: ptw = 300
         else: ptw = 550
-        intensity = figure( **plot_config, plot_width = ptw, x_range = [ self.WL_min, self.WL_max], 
+        intensity = figure( **plot_config, width = ptw, x_range = [ self.WL_min, self.WL_max], 
                             x_axis_label = 'Wavelength', y_axis_label = 'Intensity' )
-        nor_intensity = figure( **plot_config, plot_width = 300, x_range = [ self.WL_min, self.WL_max], y_range = [0, 1.05], 
+        nor_intensity = figure( **plot_config, width = 300, x_range = [ self.WL_min, self.WL_max], y_range = [0, 1.05], 
                             x_axis_label = 'Wavelength', y_axis_label = 'Normalized Intensity' )
-        integral_spec = figure( **plot_config, plot_width = ptw, x_range = [ self.WL_min-1, self.WL_min + N ], 
+        integral_spec = figure( **plot_config, width = ptw, x_range = [ self.WL_min-1, self.WL_min + N ], 
                             y_axis_label = 'Ingetral Spectrum' )
-        shift_coef = figure( **plot_config, plot_width = 300, x_range = [ self.WL_min-1, self.WL_min + N ], 
+        shift_coef = figure( **plot_config, width = 300, x_range = [ self.WL_min-1, self.WL_min + N ], 
                             y_range = self.pSSC_yrange, y_axis_label = 'Shift Coefficient (/'+ str(self.WL_peak) + 'nm)' )
 
         return source, intensity, nor_intensity, integral_spec, shift_coef, colors
 
     def create_external_legend( self, specColName, rLeg ):
-        legend = Legend( items = [ ( specColName[i], [rLeg[i]] ) for i in range( len(specColName))], location = ( 0, 0 ))
+        from bokeh.models import Legend, LegendItem
+        # rLeg: one line renderer per spectrum, or one multi_line renderer of all spectra
+        if isinstance( rLeg, list ): items = [ ( specColName[i], [rLeg[i]] ) for i in range( len(specColName))]
+        else: items = [ LegendItem( label = specColName[i], renderers = [rLeg], index = i ) for i in range( len(specColName))]
+        legend = Legend( items = items, location = ( 0, 0 ))
         legend.background_fill_alpha = 0
         legend.label_text_font_size = '6pt'
         legend.border_line_width = 0
@@ -264,8 +520,14 @@ class ExpPL:
         legend.label_width = 150
         return legend
 
-    def plot_spectrum( self, spectrum, specColName, NorSpecColName ):
-        source, intensity, nor_intensity, integral_spec, shift_coef, colors = self.config_plot( spectrum )
+    @staged( 'plot_spectrum' )
+    def plot_spectrum( self, result ):
+        """plot a resultlib.SpecResult: return it"""
+        if self.fg_light_plot: return self.plot_spectrum_light( result )
+        from bokeh.plotting import gridplot, show
+        # - one source of the wide legacy table
+        spectrum, specColName, NorSpecColName = result.to_legacy( self.WL_min )
+        source, intensity, nor_intensity, integral_spec, shift_coef, colors = self.config_plot( len( result ), spectrum )
         if self.fg_legend: rLeg = []
         for i in range( len( specColName )):
             # raw intensity
@@ -281,8 +543,8 @@ class ExpPL:
         integral_spec.scatter( x = 'Wavelength', y = 'IntSpec', color = colors[0], alpha=0.6, source = source )
         if self.aHR_range:
             # spectrum shift coefficient & apparent Hung-Ray factor
-            shift_coef.scatter( x = 'Wavelength', y = 'SpecShiftCoef', color = colors[0], alpha=0.6, legend='SSC', source = source )
-            shift_coef.scatter( x = 'Wavelength', y = 'aHR', color = colors[2], alpha=0.6, legend='HR', source = source )
+            shift_coef.scatter( x = 'Wavelength', y = 'SpecShiftCoef', color = colors[0], alpha=0.6, legend_label='SSC', source = source )
+            shift_coef.scatter( x = 'Wavelength', y = 'aHR', color = colors[2], alpha=0.6, legend_label='HR', source = source )
             shift_coef.legend.border_line_alpha = 0
             shift_coef.legend.location = 'center_left'
             show( gridplot([intensity, nor_intensity, integral_spec, shift_coef ], ncols=2, sizing_mode='fixed'))
@@ -290,27 +552,134 @@ class ExpPL:
             # make a grid & show the results
             show( gridplot([intensity, nor_intensity, integral_spec ], ncols=2, sizing_mode='fixed'))
 
-        return spectrum, specColName, NorSpecColName
+        return result
+
+    def light_sources( self, result ):
+        """sources of the lightweight plot: ( multi_line source of the spectra, source of the metrics )"""
+        from bokeh.models import ColumnDataSource
+        dtype = np.float32 if self.fg_float32 else np.float64
+        # - raw & normalized spectra share the downsampled points (normalizing does not move them)
+        data = plotlib.multi_line_data( result.WL, result.intensity, self.plot_points, self.plot_downsample, dtype, nys = result.normalized )
+        data['name'] = list( result.names )
+        # - metrics at WL_min + i, as in the classic plot
+        metric_data = { 'Wavelength': ( self.WL_min + np.arange( len( result ))).astype( dtype ) }
+        metric_data.update( { c: result.metrics[c].astype( dtype ) for c in ( [ 'IntSpec', 'SpecShiftCoef', 'aHR' ] if self.aHR_range else [ 'IntSpec' ] ) } )
+        return ColumnDataSource( data = data ), ColumnDataSource( data = metric_data )
+
+    def plot_spectrum_light( self, result ):
+        # lightweight plotting: one multi_line glyph per figure instead of one line per spectrum, from the arrays of result
+        from bokeh.plotting import gridplot, show
+        specColName = result.names
+        _, intensity, nor_intensity, integral_spec, shift_coef, colors = self.config_plot( len( result ))
+        source, metric_source = self.light_sources( result )
+        source.data['color'] = [ colors[i] for i in range( len( specColName ))]
+        rLeg = intensity.multi_line( xs = 'xs', ys = 'ys', color = 'color', line_width = 2, alpha=0.6, source = source )
+        nor_intensity.multi_line( xs = 'xs', ys = 'nys', color = 'color', alpha=0.6, source = source )
+        # legend settings
+        if self.fg_legend: intensity.add_layout( self.create_external_legend( specColName, rLeg ), 'right' )
+        # integral spectra
+        integral_spec.scatter( x = 'Wavelength', y = 'IntSpec', color = colors[0], alpha=0.6, source = metric_source )
+        if self.aHR_range:
+            # spectrum shift coefficient & apparent Hung-Ray factor
+            shift_coef.scatter( x = 'Wavelength', y = 'SpecShiftCoef', color = colors[0], alpha=0.6, legend_label='SSC', source = metric_source )
+            shift_coef.scatter( x = 'Wavelength', y = 'aHR', color = colors[2], alpha=0.6, legend_label='HR', source = metric_source )
+            shift_coef.legend.border_line_alpha = 0
+            shift_coef.legend.location = 'center_left'
+            show( gridplot([intensity, nor_intensity, integral_spec, shift_coef ], ncols=2, sizing_mode='fixed'))
+        else:
+            # make a grid & show the results
+            show( gridplot([intensity, nor_intensity, integral_spec ], ncols=2, sizing_mode='fixed'))
+
+        return result
 
     def single_folder( self, dir_path ):
-        spec_dat_path = self.read_dat_path( os.path.join( dir_path, '' ))
-        if not spec_dat_path: sys.exit()
+        self.instr.folder = dir_path
+        self.scan_tree( dir_path, fg_refresh = True )
+        spec_dat_path = self.select_dat_path( os.path.join( dir_path, '' ))
+        # - raise instead of exiting, so a batch run reports the failed job and continues
+        if not spec_dat_path: raise FileNotFoundError( 'No spectrum data in {}'.format( dir_path ))
         bg_spec = self.read_background()
-        if self.fg_plot:
-            return self.plot_spectrum( *self.get_processed_spec( spec_dat_path, bg_spec ))
+        if self.fg_plot and not self.fg_out_of_core:
+            return self.plot_spectrum( self.get_processed_spec( spec_dat_path, bg_spec ))
         else: return self.get_processed_spec( spec_dat_path, bg_spec  )
 
-    def mutiple_folder( self, dir_path ):
-        dir_path = getDatDirPath( dir_path )
-        if not dir_path: sys.exit()
-        bg_spec = self.read_background()
+    def process_folder( self, dpath, bg_spec, fg_log = False ):
+        # read, merge & export one data set: return ( log, processed spectrum )
+        log = io.StringIO() if fg_log else sys.stdout
+        with redirect_stdout( log ):
+            self.instr.folder = dpath
+            self.instr.log( '#====================================================================#' )
+            self.instr.log( 'Spectrum folder: ' + dpath )
+            # - the tree was refreshed by mutiple_folder
+            spec_dat_path = self.select_dat_path( os.path.join( dpath, '' ))
+            if spec_dat_path: processed = self.get_processed_spec( spec_dat_path, bg_spec )
+            else:
+                self.instr.log( 'No Data File', level = logging.WARNING )
+                self.instr.count( 'data_sets_dropped' )
+                processed = None
+            if fg_log: self.wait_export()
+        return log.getvalue() if fg_log else '', processed
+
+    def process_pool( self, n_workers, bg_spec ):
+        # process pool of the data sets: None if processes are not available
+        try:
+            return ProcessPoolExecutor( max_workers = n_workers, initializer = _init_worker, initargs = ( self, bg_spec ))
+        except ( OSError, NotImplementedError ) as e:
+            self.instr.log( 'Process pool is not available ({}), continue in serial.'.format( e ), level = logging.WARNING )
+            return None
+
+    def map_folder( self, dir_path, bg_spec, n_workers = 1 ):
+        # process data sets in a process pool & yield the results in the order of dir_path
+        pool = self.process_pool( n_workers, bg_spec ) if n_workers > 1 and len( dir_path ) > 1 else None
+        if pool is not None:
+            done = 0
+            try:
+                with pool:
+                    for log, processed, report in pool.map( _process_folder, dir_path ):
+                        # - stages & counters of the workers are added to the report of this instance
+                        self.instr.merge( report )
+                        done += 1
+                        yield log, processed
+                return
+            except ( BrokenProcessPool, PicklingError ) as e:
+                # - errors of a data set are raised as they are; only workers which could not start (or receive the instance) fall back to serial
+                if done: raise
+                self.instr.log( 'Process pool is not available ({}), continue in serial.'.format( e ), level = logging.WARNING )
+        # serial fallback
         for dpath in dir_path:
-            print('#====================================================================#')
-            print('Spectrum folder: ' + dpath )
-            spec_dat_path = self.read_dat_path( os.path.join( dpath, '' ))
-            if spec_dat_path:
-                if self.fg_plot:
-                    self.plot_spectrum( *self.get_processed_spec( spec_dat_path, bg_spec ))
-                else: self.get_processed_spec( spec_dat_path, bg_spec  )
-            else: print('No Data File')
+            yield self.process_folder( dpath, bg_spec )
 
+    def mutiple_folder( self, dir_path, n_workers = 1 ):
+        set_path = getDatDirPath( dir_path, self.scan_tree( dir_path, fg_refresh = True ), self.instr.warn )
+        if not set_path: raise FileNotFoundError( 'No data set directory in {}'.format( dir_path ))
+        bg_spec = self.read_background()
+        results = []
+        for log, processed in self.map_folder( set_path, bg_spec, n_workers ):
+            if log: print( log, end = '' )
+            if processed and self.fg_plot and not self.fg_out_of_core: self.plot_spectrum( processed )
+            results.append( processed )
+        return results
+
+    def watch_folder( self, dir_path, interval = 0.5, duration = None, callback = None, export_interval = 10 ):
+        """process new acquisitions in dir_path as they are written, until duration (s) or KeyboardInterrupt"""
+        bg_spec = self.read_background()
+        watcher = FolderWatcher( self, dir_path, bg_spec, callback = callback, export_interval = export_interval )
+        processed = watcher.run( interval, duration )
+        if processed and self.fg_plot: return self.plot_spectrum( processed )
+        return processed
+
+###############################
+#   Process Pool Workers      #
+###############################
+
+# the instance and background spectrum are sent once per worker process
+_worker = {}
+
+def _init_worker( exp_pl, bg_spec ):
+    _worker['exp_pl'], _worker['bg_spec'] = exp_pl, bg_spec
+
+def _process_folder( dpath ):
+    # ( log, processed spectrum, report of the stages & counters of this data set )
+    exp_pl = _worker['exp_pl']
+    exp_pl.instr.reset()
+    return ( *exp_pl.process_folder( dpath, _worker['bg_spec'], fg_log = True ), exp_pl.instr.report())
@@ -7,9 +7,10 @@
 # covert seaborn color palette to hex: http://stackoverflow.com/questions/33395638/python-sns-color-palette-output-to-hex-number-for-bokeh
 # right y axis ref to twin axes: http://bokeh.pydata.org/en/latest/docs/user_guide/plotting.html#twin-axes
 
-from bokeh.plotting import figure
-from bokeh.models import Range1d, LinearAxis
-import seaborn as sns
+import numpy as np
+from functools import lru_cache
+from bokeh.plotting import figure, gridplot
+from bokeh.models import Range1d, LinearAxis, ColumnDataSource, HoverTool, LinearColorMapper
 
 def generate_colorbar( palette, low = 0, high = 1, plot_height = 400, plot_width = 80, orientation = 'v'):
     y = np.linspace( low, high,len(palette))
@@ -22,7 +23,7 @@ def generate_colorbar( palette, low = 0, high = 1, plot_height = 400, plot_width
         fig.rect( x = 0.5, y = y, color=palette, width=1, height = dy )
         fig.add_layout( LinearAxis( y_range_name = 'raxis', major_label_text_font_size = '10pt' ), 'right' )
     elif orientation.lower()=='h':
-        fig = figure( y_range = [0, 1], x_range = [low, high], plot_width = plot_width, plot_height=plot_height )
+        fig = figure( y_range = [0, 1], x_range = [low, high], width = plot_width, height = plot_height )
         fig.toolbar_location='above'
         fig.yaxis.visible = False
         fig.rect(x=y, y=0.5, color=palette, width=dy, height = 1)
@@ -35,88 +36,96 @@ def generate_colorbar( palette, low = 0, high = 1, plot_height = 400, plot_width
 # bokeh single polar plot ref: https://github.com/GCBallesteros/Bokeh_Examples/blob/master/polar.py
 # bokeh 2 polar plot ref: https://github.com/GCBallesteros/Bokeh_Examples/blob/master/polar_fight.py
 # hovertools: http://bokeh.pydata.org/en/latest/docs/user_guide/tools.html
+#
+# The points are drawn from a ColumnDataSource of ( x, y, metric columns ); colors are mapped
+# in the browser by a LinearColorMapper, so only the values are sent. The geometry of the
+# static layers (circles, spokes, labels) is computed once per grid and shared by every plot.
 
-import numpy as np
-import math
-from bokeh.plotting import figure, ColumnDataSource
-from bokeh.models import HoverTool
+MAX_RADIUS, R_INTERVAL = 90, 15
+MAX_PHI, PHI_INTERVAL = 90, 15
+POLAR_RANGE = ( -12, 97 )
 
-def polar( phi, r, values = None, plot_height = 400, plot_width = 400, palette = 'orange', palette_max = 1, palette_min = 0, hover_tool = False ):
-    min_angle = 0
-    max_angle = np.pi/2
-    max_radius, r_interval = 90, 15
-    max_phi, phi_interval = 90, 15
+@lru_cache( maxsize = 8 )
+def polar_grid( max_radius = MAX_RADIUS, r_interval = R_INTERVAL, max_phi = MAX_PHI, phi_interval = PHI_INTERVAL ):
+    """geometry of the static layers of a polar plot (cached per grid)"""
+    radius = np.arange( 0, max_radius + 1, r_interval, dtype = np.float64 )
+    phi_angles = np.arange( 0, max_phi + 1, phi_interval )
+    spokes = np.deg2rad( phi_angles )
+    r_labels = np.linspace( 0, max_radius, len( radius ))
+    return {
+        'radius': radius, 'max_radius': max_radius, 'spokes': spokes,
+        # - radial labels along the y axis and the x axis
+        'y_label': ( np.full( len( r_labels ), -3.5 ), r_labels, [ '%.0f°' % s for s in r_labels ] ),
+        'x_label': ( r_labels + 3.5, np.full( len( r_labels ), -5.5 ), [ '%.0f°' % s for s in r_labels ] ),
+        # - angle labels at the end of the spokes
+        'phi_label': ( max_radius * np.cos( spokes ), max_radius * np.sin( spokes ), [ str( a ) + '°' for a in phi_angles ], -np.pi/2 + spokes ),
+    }
 
-    # Coordinates in cartesian coordinates normalized
-    x = r * np.cos(phi)
-    y = r * np.sin(phi)
+def draw_polar_grid( p, grid ):
+    # radial coordinates grid
+    zeros = np.zeros( len( grid['radius'] ))
+    p.annular_wedge( zeros, zeros, zeros, grid['radius'], 0, np.pi/2,
+                     fill_color=None, line_color="gray", line_dash="4 4", line_width=0.5 )
+    p.annular_wedge( [0.0], [0.0], [0.], [grid['max_radius']], 0, np.pi/2,
+                     fill_color=None, line_color="#37435E", line_width=1.5 )
+    # radial labels
+    label = dict( text_font_size="11pt", text_align="right", text_baseline="middle", text_color="gray" )
+    for x, y, text in ( grid['y_label'], grid['x_label'] ):
+        p.text( x, y, text, angle=np.zeros( len( text )), **label )
+    # angular grid & labels
+    n_spokes = len( grid['spokes'] )
+    p.ray( np.zeros( n_spokes ), np.zeros( n_spokes ), np.ones( n_spokes ) * grid['max_radius'], grid['spokes'],
+           line_color="gray", line_width=0.5, line_dash="4 4" )
+    x, y, text, angle = grid['phi_label']
+    p.text( x, y, text, angle=angle, text_font_size="11pt", text_align="center", text_baseline="bottom", text_color="gray" )
 
-    # Create the figure
-    if hover_tool:
-        source = ColumnDataSource(data=dict( x = x, y = y, values = values ))
-        hover = HoverTool( tooltips=[("", "@values")])
-        tools = "pan,wheel_zoom,reset,save,box_select"
-        p = figure( plot_width=plot_width, plot_height=plot_height,
-                   tools = [hover, tools],
-                   x_range=( -12, 97 ), y_range=( -12, 97))
-    else:
-        p = figure( plot_width=plot_width, plot_height=plot_height, x_range=( -12, 97 ), y_range=( -12, 97))
+def polar_figure( plot_height = 400, plot_width = 400, hover = None, x_range = POLAR_RANGE, y_range = POLAR_RANGE, grid = None ):
+    tools = "pan,wheel_zoom,reset,save,box_select"
+    p = figure( width = plot_width, height = plot_height, tools = [ hover, tools ] if hover else tools, x_range = x_range, y_range = y_range )
     p.axis.visible = False
     p.grid.grid_line_color = None
-    
-    # Plot the line and set ranges and eliminate the cartesian grid
-    pal_size = len(palette)
-    if pal_size > 1 and values:
-        #val_pal = [ palette[int(v*pal_size)] for v in values ]
-        val_interval = ( palette_max - palette_min ) / pal_size
-        pal_index = [ ( v - palette_min ) / val_interval for v in values ]
-        pal_index = [ pal_size - 1 if v >= pal_size else 0 if v < 0 else v for v in pal_index ]
-        val_pal = [ palette[math.ceil(ind)] for ind in pal_index ]
-        if hover_tool:
-            p.scatter( 'x', 'y', size=15, radius = 3, line_color = None, fill_color = val_pal, source = source )
-        else: p.scatter( x, y, size=15, radius = 3, line_color = None, fill_color = val_pal )
-    else:
-        p.scatter( x, y, size=15, radius = 3, line_color = None, fill_color = palette )
+    draw_polar_grid( p, grid or polar_grid())
+    return p
 
-    # Draw the radial coordinates grid
-    radius = list( range( 0, max_radius+1, r_interval ))
-    zeros = np.zeros( len( radius ))
-    p.annular_wedge(zeros, zeros, zeros, radius, 0, np.pi/2,
-                    fill_color=None, line_color="gray",
-                    line_dash="4 4", line_width=0.5)
-    p.annular_wedge([0.0], [0.0], [0.], [max_radius], 0, np.pi/2,
-                    fill_color=None, line_color="#37435E", line_width=1.5)
+def polar_color( name, palette, low, high ):
+    # single color, or palette mapped in the browser from column name
+    if isinstance( palette, str ): return palette
+    return { 'field': name, 'transform': LinearColorMapper( palette = list( palette ), low = low, high = high ) }
 
-    # Radial Labels
-    x_labels = -3.5
-    y_labels = np.linspace(0, max_radius, len( radius ))
-    number_labels = ["%.0f°" % s for s in y_labels ]
-    # - y label
-    p.text( x_labels, y_labels, number_labels,
-            angle=np.zeros( int( max_radius/r_interval )),
-            text_font_size="11pt", text_align="right", text_baseline="middle",
-            text_color="gray")
-    # - x label
-    p.text( [ y+3.5 for y in y_labels ], x_labels-2, number_labels,
-            angle=np.zeros( int( max_radius/r_interval )),
-            text_font_size="11pt", text_align="right", text_baseline="middle",
-            text_color="gray")
+def polar_source( table, names = () ):
+    """source of polar plots: x, y of ( theta, phi_rad ) of table and its columns names"""
+    r, phi = np.asarray( table['theta'], dtype = np.float64 ), np.asarray( table['phi_rad'], dtype = np.float64 )
+    data = { 'x': r * np.cos( phi ), 'y': r * np.sin( phi ), 'theta': r, 'phi': np.rad2deg( phi ) }
+    data.update( { n: np.asarray( table[n], dtype = np.float64 ) for n in names } )
+    return ColumnDataSource( data = data )
 
-    #Draw angular grid
-    phi_angles = list( range( 0, max_phi+1, phi_interval ) )
-    n_spokes = len( phi_angles )
-    angles_spokes = np.linspace( min_angle, max_angle, n_spokes)
-    p.ray( np.zeros(n_spokes), np.zeros(n_spokes), np.ones(n_spokes)*max_radius,
-            angles_spokes,
-            line_color="gray", line_width=0.5, line_dash="4 4")
+def polar( phi, r, values = None, plot_height = 400, plot_width = 400, palette = 'orange', palette_max = 1, palette_min = 0, hover_tool = False ):
+    source = polar_source( { 'theta': r, 'phi_rad': phi, 'values': np.zeros( len( r )) if values is None else values }, [ 'values' ] )
+    hover = HoverTool( tooltips=[("", "@values")]) if hover_tool else None
+    p = polar_figure( plot_height, plot_width, hover )
+    color = polar_color( 'values', palette if values is not None else ( palette if isinstance( palette, str ) else palette[0] ), palette_min, palette_max )
+    p.circle( x = 'x', y = 'y', radius = 3, line_color = None, fill_color = color, source = source )
+    return p
 
-    # Angle Labels
-    x_labels = max_radius * np.cos(angles_spokes)
-    y_labels = max_radius * np.sin(angles_spokes)
-    p.text(x_labels, y_labels, [ str(a)+'°' for a in phi_angles ],
-         angle=-np.pi/2+angles_spokes,
-         text_font_size="11pt", text_align="center", text_baseline="bottom",
-         text_color="gray")
+def polar_table( table, name, **kwargs ):
+    """polar plot of metric name of an angle table (anglib.angle_table, ExpPL metrics with fg_ang)"""
+    return polar( table['phi_rad'].values, table['theta'].values, table[name].values, **kwargs )
 
-    return p
+def polar_multiples( table, names, palette, ncols = 3, plot_height = 300, plot_width = 300, value_range = None, hover_tool = True ):
+    """linked polar plots of several metrics of an angle table, all drawn from one source
 
+    value_range: { name: ( low, high ) } of the color mapping (default: range of each metric)"""
+    source = polar_source( table, names )
+    value_range = value_range or {}
+    plots = []
+    for name in names:
+        values = source.data[name]
+        low, high = value_range.get( name, ( np.nanmin( values ), np.nanmax( values )))
+        hover = HoverTool( tooltips = [ ( name, '@{' + name + '}' ), ( 'theta', '@theta' ), ( 'phi', '@phi' ) ] ) if hover_tool else None
+        # - shared ranges link pan & zoom, the shared source links selections
+        p = polar_figure( plot_height, plot_width, hover,
+                          x_range = plots[0].x_range if plots else POLAR_RANGE, y_range = plots[0].y_range if plots else POLAR_RANGE )
+        p.title.text = name
+        p.circle( x = 'x', y = 'y', radius = 3, line_color = None, fill_color = polar_color( name, palette, low, high ), source = source )
+        plots.append( p )
+    return gridplot( plots, ncols = ncols )
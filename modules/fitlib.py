@@ -0,0 +1,173 @@
+###############################
+#   Vibronic Fit              #
+###############################
+
+# Franck-Condon fit of the PL spectra of a batch: in photon energy E = hc / WL, each
+# spectrum is a progression of Gaussians below the 0-0 transition E00,
+#
+#   I(E) = A * sum_m exp(-S) S^m / m! * exp( -( E - E00 + m E_vib )^2 / 2 sigma^2 ),  m = 0 .. n_vib
+#
+# with Huang-Rhys factor S, vibronic energy E_vib and width sigma. All spectra of a batch
+# are fitted at once by Levenberg-Marquardt steps on residuals[n, E] and analytic
+# jacobians[n, E, parameter] (one batched linear solve per iteration). Spectra whose fit
+# fails (R2 < min_r2) are refitted from the parameters of their nearest successful
+# neighbour in the batch (the next angle or time of a data set), then one by one with
+# scipy.optimize.least_squares if scipy is available.
+
+import numpy as np
+import cachelib
+
+HC = 1239.84193 # eV nm
+PARAMS = ( 'A', 'E00', 'E_vib', 'S', 'sigma' )
+LOWER = np.array( [ 0, -np.inf, 0.02, 1e-6, 1e-3 ] )
+UPPER = np.array( [ np.inf, np.inf, 0.5, 10, 0.5 ] )
+# metrics of a fit ( VibFWHM: FWHM of one vibronic band, eV )
+FIT_METRICS = ( 'HR_S', 'E00', 'E_vib', 'VibFWHM', 'FitR2', 'FitRMSE' )
+SIGMA2FWHM = 2 * np.sqrt( 2 * np.log( 2 ))
+# starts of every fit: ( 0-0 transition at the maximum + shift * E_vib, S )
+STARTS = ( ( 0, 0.7 ), ( 1, 1.5 ))
+
+def progression( E, P, n_vib ):
+    """model[n, E] and jacobian[n, E, parameter] of the progression with parameters P[n] = ( A, E00, E_vib, S, sigma )"""
+    A, E00, E_vib, S, sigma = ( P[:, i, None, None] for i in range( len( PARAMS )))
+    m = np.arange( n_vib + 1, dtype = np.float64 )[:, None]
+    u = E - E00 + m * E_vib
+    wg = np.exp( -S + m * np.log( S ) - np.cumsum( np.log( np.maximum( m, 1 )), axis = 0 ) - 0.5 * ( u / sigma )**2 )
+    base = wg.sum( axis = 1 )
+    A, sigma = A[:, 0], sigma[:, 0]
+    jac = np.stack( [ base,
+                      A * ( wg * u ).sum( axis = 1 ) / sigma**2,
+                      -A * ( wg * u * m ).sum( axis = 1 ) / sigma**2,
+                      A * ( wg * ( m / S - 1 )).sum( axis = 1 ),
+                      A * ( wg * u**2 ).sum( axis = 1 ) / sigma**3 ], axis = 2 )
+    return A * base, jac
+
+def initial_guess( E, Y, E_vib, n_vib, shift = 0, S = 1 ):
+    # 0-0 transition at the maximum (+ shift vibronic bands), sigma from the FWHM of the spectrum
+    rows = np.arange( len( Y ))
+    peak = np.argmax( Y, axis = 1 )
+    half = Y >= Y[rows, peak][:, None] / 2
+    width = np.where( half, E, -np.inf ).max( axis = 1 ) - np.where( half, E, np.inf ).min( axis = 1 )
+    sigma = np.clip( width / SIGMA2FWHM / 2, 0.01, E_vib / 2 )
+    P = np.column_stack( [ np.ones( len( Y )), E[peak] + shift * E_vib, np.full( len( Y ), E_vib ), np.full( len( Y ), S ), sigma ] )
+    model = progression( E, P, n_vib )[0]
+    P[:, 0] = Y.max( axis = 1 ) / model.max( axis = 1 )
+    return P
+
+def solve( H, g ):
+    try: return np.linalg.solve( H, g[..., None] )[..., 0]
+    except np.linalg.LinAlgError: return ( np.linalg.pinv( H ) @ g[..., None] )[..., 0]
+
+def levenberg_marquardt( E, Y, P, n_vib, max_iter = 200, tol = 1e-10 ):
+    """batched Levenberg-Marquardt fit of every row of Y from P: return fitted P"""
+    P = np.clip( P, LOWER, UPPER )
+    model, jac = progression( E, P, n_vib )
+    res = model - Y
+    cost = ( res**2 ).sum( axis = 1 )
+    lam = np.full( len( Y ), 1e-3 )
+    active = np.isfinite( cost )
+    for _ in range( max_iter ):
+        ind = np.flatnonzero( active )
+        if not len( ind ): break
+        J = jac[ind]
+        JTJ = J.transpose( 0, 2, 1 ) @ J
+        # - Marquardt scaling of the damping by the diagonal of J^T J
+        diag = np.einsum( 'nii->ni', JTJ )
+        H = JTJ + ( lam[ind, None] * diag + 1e-12 )[:, :, None] * np.eye( len( PARAMS ))
+        step = -solve( H, np.einsum( 'nkp,nk->np', J, res[ind] ))
+        trial = np.clip( P[ind] + step, LOWER, UPPER )
+        t_model, t_jac = progression( E, trial, n_vib )
+        t_res = t_model - Y[ind]
+        t_cost = ( t_res**2 ).sum( axis = 1 )
+        better = t_cost < cost[ind]
+        acc = ind[better]
+        # - converged: cost does not decrease any more, or no step can decrease it
+        done = np.zeros( len( ind ), dtype = bool )
+        done[better] = cost[acc] - t_cost[better] <= tol * cost[acc]
+        P[acc], jac[acc], res[acc], cost[acc] = trial[better], t_jac[better], t_res[better], t_cost[better]
+        lam[acc] /= 10
+        lam[ind[~better]] *= 10
+        done |= ~np.isfinite( step ).all( axis = 1 ) | ( lam[ind] > 1e10 )
+        active[ind[done]] = False
+    return P
+
+def fit_quality( E, Y, P, n_vib ):
+    # R2 & RMSE of the fits
+    res = progression( E, P, n_vib )[0] - Y
+    ss_res = ( res**2 ).sum( axis = 1 )
+    ss_tot = (( Y - Y.mean( axis = 1, keepdims = True ))**2 ).sum( axis = 1 )
+    return 1 - ss_res / ss_tot, np.sqrt( ss_res / Y.shape[1] )
+
+def nearest( ind, good ):
+    # nearest good row of every row ind (rows of a batch are ordered by angle or time)
+    pos = np.clip( np.searchsorted( good, ind ), 1, len( good ) - 1 ) if len( good ) > 1 else np.zeros( len( ind ), dtype = int )
+    if len( good ) == 1: return good[pos]
+    lo, hi = good[pos-1], good[pos]
+    return np.where( np.abs( ind - lo ) <= np.abs( hi - ind ), lo, hi )
+
+def fit_single( E, y, p, n_vib ):
+    # fallback: one spectrum with scipy (None without scipy or if the fit fails)
+    try:
+        from scipy.optimize import least_squares
+    except ImportError:
+        return None
+    def fun( q ): return progression( E, q[None], n_vib )[0][0] - y
+    def jac( q ): return progression( E, q[None], n_vib )[1][0]
+    p = np.clip( p, LOWER + 1e-9, np.minimum( UPPER - 1e-9, 1e6 ))
+    try: return least_squares( fun, p, jac = jac, bounds = ( LOWER, UPPER ), method = 'trf' ).x
+    except ( ValueError, np.linalg.LinAlgError ): return None
+
+def fit_batch( spec, WL, E_vib = 0.18, n_vib = 4, min_r2 = 0.9 ):
+    """vibronic fit of spectra spec[n, WL]: return { 'HR_S', 'E00', 'E_vib', 'VibFWHM', 'FitR2', 'FitRMSE' } of arrays[n] (energies in eV)"""
+    spec, WL = np.asarray( spec, dtype = np.float64 ), np.asarray( WL, dtype = np.float64 )
+    E = HC / WL
+    # - intensity per energy interval, normalized
+    Y = spec * WL**2
+    peak = Y.max( axis = 1 ) if Y.size else np.zeros( len( Y ))
+    valid = np.isfinite( peak ) & ( peak > 0 )
+    Y = Y / np.where( valid, peak, 1 )[:, None]
+    P = np.full( ( len( Y ), len( PARAMS )), np.nan )
+    r2, rmse = np.full( len( Y ), np.nan ), np.full( len( Y ), np.nan )
+    ind = np.flatnonzero( valid )
+    if len( ind ):
+        # - every start of every spectrum in one batch; the best fit of each spectrum is kept
+        P0 = np.vstack( [ initial_guess( E, Y[ind], E_vib, n_vib, shift, S ) for shift, S in STARTS ] )
+        fit = levenberg_marquardt( E, np.tile( Y[ind], ( len( STARTS ), 1 )), P0, n_vib )
+        q_r2, q_rmse = ( q.reshape( len( STARTS ), -1 ) for q in fit_quality( E, np.tile( Y[ind], ( len( STARTS ), 1 )), fit, n_vib ))
+        best = np.argmax( np.nan_to_num( q_r2, nan = -np.inf ), axis = 0 )
+        cols = np.arange( len( ind ))
+        P[ind] = fit.reshape( len( STARTS ), len( ind ), -1 )[best, cols]
+        r2[ind], rmse[ind] = q_r2[best, cols], q_rmse[best, cols]
+    failed = valid & ~( r2 >= min_r2 )
+    good = np.flatnonzero( valid & ( r2 >= min_r2 ))
+    # - warm start of failed fits from their nearest good neighbour
+    if failed.any() and len( good ):
+        ind = np.flatnonzero( failed )
+        P0 = P[nearest( ind, good )]
+        P0[:, 0] *= 1 / np.maximum( progression( E, P0, n_vib )[0].max( axis = 1 ), 1e-12 )
+        Pw = levenberg_marquardt( E, Y[ind], P0, n_vib )
+        r2w, rmsew = fit_quality( E, Y[ind], Pw, n_vib )
+        better = r2w > np.nan_to_num( r2[ind], nan = -np.inf )
+        P[ind[better]], r2[ind[better]], rmse[ind[better]] = Pw[better], r2w[better], rmsew[better]
+        failed = valid & ~( r2 >= min_r2 )
+    # - per-spectrum fallback
+    for i in np.flatnonzero( failed ):
+        p = fit_single( E, Y[i], np.nan_to_num( P[i], nan = 1.0 ), n_vib )
+        if p is None: continue
+        q = fit_quality( E, Y[i:i+1], p[None], n_vib )
+        if q[0][0] > np.nan_to_num( r2[i], nan = -np.inf ):
+            P[i], r2[i], rmse[i] = p, q[0][0], q[1][0]
+    return { 'HR_S': P[:, 3], 'E00': P[:, 1], 'E_vib': P[:, 2], 'VibFWHM': P[:, 4] * SIGMA2FWHM, 'FitR2': r2, 'FitRMSE': rmse }
+
+# the fit of the last batch is shared by the FIT_METRICS stages of metriclib
+_last_fit = {}
+
+def fit_metric( name ):
+    """metric stage func( spec, WL, E_vib, n_vib ) of fit value name"""
+    def metric( spec, WL, E_vib, n_vib ):
+        key = ( cachelib.array_fingerprint( spec ), cachelib.array_fingerprint( WL ), E_vib, n_vib )
+        if key not in _last_fit:
+            _last_fit.clear()
+            _last_fit[key] = fit_batch( spec, WL, E_vib, n_vib )
+        return _last_fit[key][name]
+    return metric
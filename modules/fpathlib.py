@@ -1,20 +1,163 @@
-import glob, os, shutil, re
+import glob, os, shutil, re, json, hashlib, fnmatch
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
+@lru_cache( maxsize = 2**16 )
 def natural_key(string_):
     """See http://www.codinghorror.com/blog/archives/001018.html"""
-    return [int(s) if s.isdigit() else s for s in re.split(r'(\d+)', string_)]
+    return tuple( int(s) if s.isdigit() else s for s in re.split(r'(\d+)', string_) )
 
-def getDatDirPath( par_dir ):
-    # find all subfolders in parent directory
-    dir_path = sorted( glob.glob( os.path.join( par_dir, '*' )), key=natural_key )
-    dir_path = [ d for d in dir_path if os.path.isdir( d )]
-    if not dir_path: print( getDatDirPath.__name__+'()', 'No directory was found in', par_dir )
+###############################
+#   Tree Index                #
+###############################
+
+# Directories and files of a measurement tree, scanned once with os.scandir (level by
+# level, n_threads directories at a time for network filesystems) and queried by
+# getDatDirPath, getDatPath and ExpPL instead of a glob and a stat per entry. Sizes and
+# mtimes are those of the scan. With index_dir the index is persisted as JSON; the next
+# refresh stats every known directory once and rescans only new or modified ones (a new
+# acquisition modifies its folder).
+
+def list_dir( path ):
+    # names of ( subdirectories, files ) of path, without a stat of each entry
+    dirs, files = [], []
+    with os.scandir( path ) as it:
+        for e in it:
+            try: ( dirs if e.is_dir() else files ).append( e.name )
+            except OSError: continue
+    return dirs, files
+
+def scan_dir( path ):
+    """index entry of directory path: { 'mtime', 'dirs': [name], 'files': { name: [size, mtime] } } (None if not a directory)"""
+    try:
+        mtime = os.stat( path ).st_mtime_ns
+        dirs, files = [], {}
+        with os.scandir( path ) as it:
+            for e in it:
+                try:
+                    if e.is_dir():
+                        # - like glob, hidden directories are skipped
+                        if not e.name.startswith( '.' ): dirs.append( e.name )
+                    else:
+                        stat = e.stat()
+                        files[e.name] = [ stat.st_size, stat.st_mtime_ns ]
+                except OSError: continue
+    except OSError:
+        return None
+    return { 'mtime': mtime, 'dirs': sorted( dirs, key = natural_key ), 'files': files }
+
+def dir_mtime( path ):
+    try: return os.stat( path ).st_mtime_ns
+    except OSError: return None
+
+def visible( names, pattern = '*' ):
+    # names matching pattern; like glob, '*' does not match hidden names
+    names = fnmatch.filter( names, pattern )
+    if not pattern.startswith( '.' ): names = [ n for n in names if not n.startswith( '.' )]
+    return sorted( names, key = natural_key )
+
+class TreeIndex:
+    """directories, files and ( size, mtime ) of the tree under root, scanned once with os.scandir"""
+    def __init__( self, root, n_threads = 1, index_dir = None ):
+        self.root = os.path.abspath( root )
+        self.n_threads = max( 1, n_threads or 1 )
+        # { absolute directory path: scan_dir entry }
+        self.dirs = {}
+        self.index_path = None
+        if index_dir:
+            key = hashlib.sha1( self.root.encode( 'utf-8' )).hexdigest()
+            self.index_path = os.path.join( index_dir, key + '.json' )
+            self.load()
+        self.refresh()
+
+    def load( self ):
+        try:
+            with open( self.index_path ) as infile:
+                index = json.load( infile )
+            if index.get( 'root' ) == self.root: self.dirs = index['dirs']
+        except ( OSError, ValueError, KeyError ):
+            self.dirs = {}
+
+    def save( self ):
+        # write to temporary file first so a concurrent reader never sees a partial index
+        if not self.index_path: return
+        try:
+            os.makedirs( os.path.dirname( self.index_path ), exist_ok = True )
+            tmp = '{}.{}.tmp'.format( self.index_path, os.getpid() )
+            with open( tmp, 'w' ) as outfile:
+                json.dump( { 'root': self.root, 'dirs': self.dirs }, outfile )
+            os.replace( tmp, self.index_path )
+        except OSError:
+            pass
+
+    def refresh( self, path = None ):
+        """scan new or modified directories (of the subtree of path): return number of scanned directories"""
+        pool = ThreadPoolExecutor( self.n_threads ) if self.n_threads > 1 else None
+        mapper = pool.map if pool else map
+        top = self.root if path is None else os.path.abspath( path )
+        # - directories outside the subtree are kept as they are
+        dirs = { d: e for d, e in self.dirs.items() if d != top and not d.startswith( os.path.join( top, '' )) }
+        level, n_scanned = [ top ], 0
+        try:
+            while level:
+                # - one stat per known directory, one scandir per new or modified directory
+                known = [ d for d in level if d in self.dirs ]
+                mtime = dict( zip( known, mapper( dir_mtime, known )))
+                scan = [ d for d in level if d not in mtime or mtime[d] != self.dirs[d]['mtime'] ]
+                entries = dict( zip( scan, mapper( scan_dir, scan )))
+                n_scanned += len( scan )
+                for d in level:
+                    entry = entries[d] if d in entries else self.dirs[d]
+                    if entry is not None: dirs[d] = entry
+                level = [ os.path.join( d, n ) for d in level if d in dirs for n in dirs[d]['dirs'] ]
+        finally:
+            if pool: pool.shutdown()
+        # - removed directories are dropped
+        self.dirs = dirs
+        self.n_scanned = n_scanned
+        if n_scanned: self.save()
+        return n_scanned
+
+    def entry( self, path ):
+        return self.dirs.get( os.path.abspath( path ))
+
+    def covers( self, path ):
+        return self.entry( path ) is not None
+
+    def subdirs( self, par_dir ):
+        entry = self.entry( par_dir )
+        return entry['dirs'] if entry else []
+
+    def files( self, par_dir, pattern = '*' ):
+        entry = self.entry( par_dir )
+        return visible( entry['files'], pattern ) if entry else []
+
+    def stat( self, fpath ):
+        """[ size, mtime ] of file fpath (None if not in the index)"""
+        d, name = os.path.split( os.path.abspath( fpath ))
+        entry = self.dirs.get( d )
+        return entry['files'].get( name ) if entry else None
+
+    def isfile( self, fpath ):
+        return self.stat( fpath ) is not None
+
+def getDatDirPath( par_dir, index = None, log = print ):
+    # find all subfolders in parent directory (from the tree index if it covers par_dir); log( *msg ) of a warning
+    if index is not None and index.covers( par_dir ): names = index.subdirs( par_dir )
+    else:
+        try: names = visible( list_dir( par_dir )[0] )
+        except OSError: names = []
+    dir_path = [ os.path.join( par_dir, d ) for d in names ]
+    if not dir_path: log( getDatDirPath.__name__+'()', 'No directory was found in', par_dir )
     return dir_path
 
-def getDatPath( par_dir, fpath_reg ):
-    dat_path_reg = os.path.join( par_dir, fpath_reg )
-    dat_path = sorted( glob.glob( dat_path_reg ), key=natural_key )
-    if not dat_path: print( getDatPath.__name__+'()', 'No \"{}\" data file was found in'.format(fpath_reg), par_dir )
+def getDatPath( par_dir, fpath_reg, index = None, log = print ):
+    if index is not None and index.covers( par_dir ) and os.sep not in fpath_reg:
+        dat_path = [ os.path.join( par_dir, n ) for n in index.files( par_dir, fpath_reg ) ]
+    else:
+        dat_path_reg = os.path.join( par_dir, fpath_reg )
+        dat_path = sorted( glob.glob( dat_path_reg ), key=natural_key )
+    if not dat_path: log( getDatPath.__name__+'()', 'No \"{}\" data file was found in'.format(fpath_reg), par_dir )
     return dat_path
 
 def getFileName( par_dir, fpath_reg ):
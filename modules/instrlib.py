@@ -0,0 +1,88 @@
+###############################
+#   Instrumentation           #
+###############################
+
+# Stage timers, counters and optional tracemalloc peaks of the ExpPL pipeline. Messages
+# and events go to the 'exppl' logger and to an optional callback( event ); printing to
+# the notebook (the former print() diagnostics) can be switched off with fg_verbose.
+
+import time, logging, tracemalloc, functools
+from contextlib import contextmanager
+
+logger = logging.getLogger( 'exppl' )
+# - without a handler of the application, messages are not printed a second time by logging's last resort
+logger.addHandler( logging.NullHandler())
+
+class Instrument:
+    def __init__( self, fg_verbose = True, callback = None, fg_memory = False ):
+        # print messages (notebook output)
+        self.fg_verbose = fg_verbose
+        # callback( event ): event is a dict with 'event' in ( 'log', 'stage' )
+        self.callback = callback
+        # tracemalloc peak of every stage
+        self.fg_memory = fg_memory
+        # current data set, attached to every event
+        self.folder = None
+        self.reset()
+
+    def reset( self ):
+        self.stages = {}
+        self.counters = {}
+
+    def emit( self, event ):
+        if self.callback: self.callback( event )
+
+    def log( self, *msg, level = logging.INFO ):
+        text = ' '.join( str( m ) for m in msg )
+        if self.fg_verbose: print( text )
+        logger.log( level, text )
+        self.emit( { 'event': 'log', 'level': level, 'message': text, 'folder': self.folder } )
+
+    def warn( self, *msg ):
+        self.log( *msg, level = logging.WARNING )
+
+    def count( self, name, n = 1 ):
+        self.counters[name] = self.counters.get( name, 0 ) + n
+
+    @contextmanager
+    def stage( self, name ):
+        # - nested stages share one tracemalloc session
+        fg_trace = self.fg_memory and not tracemalloc.is_tracing()
+        if fg_trace: tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if self.fg_memory and tracemalloc.is_tracing() else None
+            if fg_trace: tracemalloc.stop()
+            stage = self.stages.setdefault( name, { 'calls': 0, 'time': 0.0, 'peak_memory': None } )
+            stage['calls'] += 1
+            stage['time'] += elapsed
+            if peak is not None: stage['peak_memory'] = max( stage['peak_memory'] or 0, peak )
+            event = { 'event': 'stage', 'stage': name, 'time': elapsed, 'peak_memory': peak, 'folder': self.folder }
+            logger.debug( 'stage %s: %.4f s (%s)', name, elapsed, self.folder )
+            self.emit( event )
+
+    def report( self ):
+        """timing of every stage and all counters"""
+        return { 'stages': { k: dict( v ) for k, v in self.stages.items() }, 'counters': dict( self.counters ) }
+
+    def merge( self, report ):
+        """add the stages & counters of report (e.g. of a process pool worker)"""
+        for name, other in report['stages'].items():
+            stage = self.stages.setdefault( name, { 'calls': 0, 'time': 0.0, 'peak_memory': None } )
+            stage['calls'] += other['calls']
+            stage['time'] += other['time']
+            if other['peak_memory'] is not None: stage['peak_memory'] = max( stage['peak_memory'] or 0, other['peak_memory'] )
+        for name, n in report['counters'].items(): self.count( name, n )
+
+def staged( name ):
+    """decorator of ExpPL methods: time the method as stage name with self.instr"""
+    def decorator( func ):
+        @functools.wraps( func )
+        def wrapper( self, *args, **kwargs ):
+            with self.instr.stage( name ):
+                return func( self, *args, **kwargs )
+        return wrapper
+    return decorator
@@ -0,0 +1,41 @@
+###############################
+#   Metric Stages             #
+###############################
+
+# Per-spectrum metrics of ExpPL as vectorized stages: every metric is one function over
+# the batch of processed spectra, func( spec[n, wavelength], WL, *params ) -> values[n].
+# params are names of ExpPL attributes (e.g. 'WL_peak'), read when the metric runs; a
+# metric whose parameter is None (e.g. aHR without aHR_range) is not computed.
+#
+# SpecShiftCoef, aHR and IntSpec are always part of the metrics table; other metrics
+# are selected with ExpPL( ..., metrics = ['PeakWL', 'FWHM'] ). A new metric is added with
+#
+#   metriclib.register_metric( 'Skewness', skewness, 'WL_peak' )
+#
+# The vibronic fit (fitlib) gives the FIT_METRICS ( HR_S, E00, E_vib, VibFWHM, FitR2,
+# FitRMSE ) of one batched fit, selected together with ExpPL( ..., fg_fit = True ).
+
+import speclib, fitlib
+
+METRICS = {
+    'SpecShiftCoef': ( speclib.spec_shift_coef, ( 'WL_peak', )),
+    'aHR': ( speclib.hr_factor, ( 'aHR_range', )),
+    'IntSpec': ( speclib.integral, ()),
+    'PeakWL': ( speclib.peak_position, ()),
+    'FWHM': ( speclib.fwhm, ()),
+    'Centroid': ( speclib.centroid, ()),
+}
+METRICS.update( { name: ( fitlib.fit_metric( name ), ( 'fit_vib', 'fit_n_vib' )) for name in fitlib.FIT_METRICS } )
+# metrics of every ExpPL, in the column order of the merged spectrum table
+BUILTIN_METRICS = ( 'SpecShiftCoef', 'IntSpec', 'aHR' )
+# - order of the exported metrics table & XLSX sheets
+EXPORT_METRICS = ( 'SpecShiftCoef', 'aHR', 'IntSpec' )
+
+def register_metric( name, func, *params ):
+    METRICS[name] = ( func, params )
+
+def get_metric( name ):
+    try:
+        return METRICS[name]
+    except KeyError:
+        raise ValueError( 'Unknown metric \'{}\', use one of {}'.format( name, sorted( METRICS )))
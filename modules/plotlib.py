@@ -0,0 +1,73 @@
+###############################
+#   Lightweight Plotting      #
+###############################
+
+# Data of the lightweight plotting path of ExpPL.plot_spectrum: all spectra of a data set
+# are drawn by one multi_line glyph from one data source which holds only the drawn
+# columns. Every spectrum can be downsampled to plot_points points:
+#
+# - lttb: Largest-Triangle-Three-Buckets, keeps the visual shape (peaks and shoulders)
+# - minmax: minimum and maximum of each bucket, keeps the intensity envelope
+#
+# All spectra share one wavelength grid, so both methods run over all spectra at once
+# (one loop over buckets, vectorized over spectra).
+
+import numpy as np
+
+DOWNSAMPLE = ( 'lttb', 'minmax' )
+
+def bucket_edges( n, n_bucket ):
+    # n_bucket buckets over the points [1, n-1); the first and the last point are always kept
+    return np.linspace( 1, n - 1, n_bucket + 1 ).astype( int )
+
+def lttb_indices( x, Y, n_out ):
+    """Largest-Triangle-Three-Buckets of each row of Y[n, pixel]: return indices[n, n_out]"""
+    n = len( x )
+    if n_out >= n or n_out < 3: return np.tile( np.arange( n ), ( len( Y ), 1 ))
+    edges = bucket_edges( n, n_out - 2 )
+    rows = np.arange( len( Y ))
+    ind = np.empty( ( len( Y ), n_out ), dtype = int )
+    ind[:, 0], ind[:, -1] = 0, n - 1
+    a = np.zeros( len( Y ), dtype = int )
+    for i in range( n_out - 2 ):
+        lo, hi = edges[i], edges[i+1]
+        # - average point of the next bucket (the last point for the last bucket)
+        if i < n_out - 3: nlo, nhi = edges[i+1], edges[i+2]
+        else: nlo, nhi = n - 1, n
+        avg_x, avg_y = x[nlo:nhi].mean(), Y[:, nlo:nhi].mean( axis = 1 )
+        # - point of the bucket forming the largest triangle with the previous point and the average
+        xa, ya = x[a], Y[rows, a]
+        area = np.abs( ( xa - avg_x )[:, None] * ( Y[:, lo:hi] - ya[:, None] ) - ( xa[:, None] - x[lo:hi] ) * ( avg_y - ya )[:, None] )
+        a = lo + np.argmax( area, axis = 1 )
+        ind[:, i+1] = a
+    return ind
+
+def minmax_indices( Y, n_out ):
+    """minimum and maximum of each bucket of each row of Y[n, pixel]: return sorted indices[n, ~n_out]"""
+    n = Y.shape[1]
+    if n_out >= n or n_out < 4: return np.tile( np.arange( n ), ( len( Y ), 1 ))
+    edges = bucket_edges( n, ( n_out - 2 ) // 2 )
+    ind = [ np.zeros( ( len( Y ), 1 ), dtype = int ) ]
+    for lo, hi in zip( edges[:-1], edges[1:] ):
+        ind.append( lo + np.argmin( Y[:, lo:hi], axis = 1 )[:, None] )
+        ind.append( lo + np.argmax( Y[:, lo:hi], axis = 1 )[:, None] )
+    ind.append( np.full( ( len( Y ), 1 ), n - 1 ))
+    return np.sort( np.hstack( ind ), axis = 1 )
+
+def downsample_indices( x, Y, n_out, method = 'lttb' ):
+    if not n_out or method is None: return np.tile( np.arange( len( x )), ( len( Y ), 1 ))
+    if method == 'lttb': return lttb_indices( x, Y, n_out )
+    if method == 'minmax': return minmax_indices( Y, n_out )
+    raise ValueError( 'Unknown downsampling \'{}\', use one of {}'.format( method, DOWNSAMPLE ))
+
+def multi_line_data( x, Y, n_out = None, method = 'lttb', dtype = np.float64, **columns ):
+    """data of a multi_line source: xs, ys (and one entry per row of every 2-D array in columns), downsampled to n_out points"""
+    x, Y = np.asarray( x, dtype = np.float64 ), np.asarray( Y, dtype = np.float64 )
+    ind = downsample_indices( x, Y, n_out, method )
+    rows = np.arange( len( Y ))[:, None]
+    data = { 'xs': list( x[ind].astype( dtype )), 'ys': list( Y[rows, ind].astype( dtype )) }
+    for name, value in columns.items():
+        value = np.asarray( value )
+        # - spectra of the same shape as Y take the same points, anything else is one value per line
+        data[name] = list( value[rows, ind].astype( dtype )) if value.shape == Y.shape else list( value )
+    return data
@@ -0,0 +1,41 @@
+###############################
+#   Prefetching Reader        #
+###############################
+
+# Producer/consumer reading of spectrum and summary files: a bounded thread pool reads
+# the next files while the consumer processes the current ones. At most depth files
+# are read ahead of the consumer (backpressure), so memory stays bounded for large
+# folders, and results are returned in the order of the files. File reads release the
+# GIL, so the threads hide the latency of network filesystems.
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+def prefetch( func, items, n_threads = 4, depth = 16 ):
+    """func( item ) of every item in order, computed by n_threads threads at most depth items ahead (serial if n_threads <= 1)"""
+    if n_threads is None or n_threads <= 1:
+        yield from map( func, items )
+        return
+    items = iter( items )
+    pool = ThreadPoolExecutor( max_workers = n_threads, thread_name_prefix = 'prefetch' )
+    pending = deque( pool.submit( func, item ) for item in islice( items, max( depth, 1 )))
+    try:
+        while pending:
+            result = pending.popleft().result()
+            # - one more item is read when one is consumed
+            for item in islice( items, 1 ):
+                pending.append( pool.submit( func, item ))
+            yield result
+    finally:
+        # consumer stopped early (or raised): drop the files which are not read yet
+        for future in pending: future.cancel()
+        pool.shutdown( wait = True )
+
+def blocks( iterable, size ):
+    """lists of size consecutive items of iterable"""
+    iterable = iter( iterable )
+    while True:
+        block = list( islice( iterable, size ))
+        if not block: return
+        yield block
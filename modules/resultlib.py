@@ -0,0 +1,104 @@
+###############################
+#   Result of a Data Set      #
+###############################
+
+# SpecResult holds the processed spectra of a data set as one contiguous array
+# intensity[n, wavelength] on a shared wavelength axis, the spectrum (folder) names and
+# the metrics as a record array ( result.metrics['aHR'] ). Normalized spectra and the
+# angles of the names are computed on first use; slices and contiguous angle selections
+# are views of the same arrays. to_frames, metrics_frame and to_legacy convert to the
+# DataFrame layouts of the export and of the classic plots (raw, normalized and metric
+# columns of one wide table, metrics at the index WL_min + i).
+
+import numpy as np
+import pandas as pd
+import speclib, anglib
+
+def metrics_record( metrics, n ):
+    # { metric: values[n] } as a record array[n] (metrics without values are NaN)
+    if not metrics: return np.recarray( n, dtype = [] )
+    return np.rec.fromarrays( [ np.asarray( v, dtype = np.float64 ).reshape( n ) for v in metrics.values() ], names = list( metrics ))
+
+class SpecResult:
+    """processed spectra intensity[n, WL] of a data set, with their names[n] and metrics record[n]"""
+    def __init__( self, WL, intensity, names, metrics, normalized = None ):
+        self.WL = np.asarray( WL, dtype = np.float64 )
+        self.intensity = np.ascontiguousarray( intensity, dtype = np.float64 )
+        self.names = list( names )
+        self.metrics = metrics if isinstance( metrics, np.ndarray ) else metrics_record( metrics, len( self.names ))
+        self._normalized = normalized
+        self._angles = None
+
+    def __len__( self ):
+        return len( self.names )
+
+    def __repr__( self ):
+        return 'SpecResult( {} spectra x {} wavelengths, metrics: {} )'.format( len( self ), len( self.WL ), ', '.join( self.metric_names ))
+
+    @property
+    def metric_names( self ):
+        return list( self.metrics.dtype.names or () )
+
+    @property
+    def nor_names( self ):
+        return [ 'Nor ' + s for s in self.names ]
+
+    @property
+    def normalized( self ):
+        """normalized spectra[n, WL] (computed on first use)"""
+        if self._normalized is None: self._normalized = speclib.normalize( self.intensity )
+        return self._normalized
+
+    @property
+    def angles( self ):
+        """theta, phi_rad & phi of the names (anglib.angle_index, parsed on first use)"""
+        if self._angles is None: self._angles = anglib.angle_index( pd.Index( self.names ))
+        return self._angles
+
+    def select( self, rows ):
+        """result of the spectra rows (slice, mask or index); a slice shares the arrays"""
+        if not isinstance( rows, slice ):
+            rows = np.asarray( rows )
+            ind = np.flatnonzero( rows ) if rows.dtype == bool else rows
+            # - contiguous rows are a slice, so the arrays are shared
+            contiguous = len( ind ) > 0 and np.array_equal( ind, np.arange( ind[0], ind[0] + len( ind )))
+            rows = slice( ind[0], ind[-1] + 1 ) if contiguous else ind
+        normalized = None if self._normalized is None else self._normalized[rows]
+        names = self.names[rows] if isinstance( rows, slice ) else [ self.names[i] for i in rows ]
+        return SpecResult( self.WL, self.intensity[rows], names, self.metrics[rows], normalized )
+
+    def by_angle( self, theta = None, phi = None ):
+        """result of the spectra at polar angle theta and/or azimuth phi (degree)"""
+        mask = np.ones( len( self ), dtype = bool )
+        if theta is not None: mask &= np.isclose( self.angles['theta'].values, theta )
+        if phi is not None: mask &= np.isclose( self.angles['phi'].values, phi )
+        return self.select( mask )
+
+    def spectrum( self, name ):
+        # intensity[WL] of spectrum name (a view)
+        return self.intensity[ self.names.index( name ) ]
+
+    # - converters to the DataFrame layouts
+
+    def metrics_dict( self ):
+        return { name: self.metrics[name].tolist() for name in self.metric_names }
+
+    def metrics_frame( self ):
+        return pd.DataFrame( self.metrics_dict(), index = self.names )
+
+    def to_frames( self ):
+        """( raw spectra, normalized spectra ) as DataFrames[WL, name]"""
+        index = pd.Index( self.WL, name = 'Wavelength' )
+        return ( pd.DataFrame( self.intensity.T, index = index, columns = self.names ),
+                 pd.DataFrame( self.normalized.T, index = index, columns = self.nor_names ))
+
+    def to_legacy( self, WL_min = None ):
+        """wide table of merge_data before SpecResult: return ( spectrum, specColName, NorSpecColName )"""
+        SpecAll, NorSpecAll = self.to_frames()
+        spectrum = pd.concat( [SpecAll, NorSpecAll], axis = 1 )
+        # - metrics at the index WL_min + i
+        WL_min = self.WL[0] if WL_min is None else WL_min
+        index = [ v + WL_min for v in range( len( self ))]
+        for name in self.metric_names:
+            spectrum[name] = pd.Series( self.metrics[name], index = index )
+        return spectrum, self.names, self.nor_names
@@ -0,0 +1,184 @@
+###############################
+#   Batch Runner              #
+###############################
+
+# Headless batch runs of ExpPL from a job manifest (TOML or JSON).
+#
+#   $ python modules/runlib.py nightly.toml --workers 4 --summary run.json
+#
+# [defaults] holds the settings shared by all jobs and every [[jobs]] entry overrides
+# them. 'path' is the data tree; 'mode' is 'multiple' (default: every data set in path),
+# 'single' or 'time_series'; 'engine' is 'exppl' (default) or 'lab_exppl'; 'n_workers'
+# is the size of the process pool of the data sets. All other keys are ExpPL arguments
+# (bg_path, WL_range, smo_win, WL_SSC_split, aHR_range, export_format, ...). Relative
+# paths are relative to the manifest. For lab_exppl, WL_range & WL_SSC_split are passed as
+# WL_setup = [WL_min, WL_max, WL_peak] and pSSC_yrange as pSSC_range; a job with an argument
+# which its engine does not accept fails before any data is read.
+#
+#   [defaults]
+#   WL_range = [500, 700]
+#   smo_win = 10
+#   n_workers = 4
+#
+#   [[jobs]]
+#   name = 'MEH-PPV'
+#   path = 'example/multiple data sets'
+#   bg_path = 'example/background'
+#   WL_SSC_split = 560
+#   aHR_range = [550, 570, 590, 610]
+#
+# A failing job is recorded in the run summary (status, error and traceback) and the
+# run continues with the next job.
+
+import os, sys, json, time, argparse, importlib, inspect, logging, traceback
+
+sys.path.insert( 0, os.path.dirname( os.path.abspath( __file__ )))
+
+import resultlib
+
+logger = logging.getLogger( 'exppl' )
+
+# keys of a job which are not ExpPL arguments
+JOB_KEYS = ( 'name', 'path', 'mode', 'engine', 'n_workers', 'error' )
+PATH_KEYS = ( 'path', 'bg_path', 'cache_dir', 'archive' )
+MODES = ( 'multiple', 'single', 'time_series' )
+
+def read_manifest( fpath ):
+    """read a TOML (.toml) or JSON manifest: return { 'defaults': {...}, 'jobs': [...] }"""
+    if fpath.lower().endswith( '.toml' ):
+        try:
+            import tomllib
+        except ImportError:
+            # python < 3.11
+            import tomli as tomllib
+        with open( fpath, 'rb' ) as infile:
+            manifest = tomllib.load( infile )
+    else:
+        with open( fpath ) as infile:
+            manifest = json.load( infile )
+    manifest['base_dir'] = os.path.dirname( os.path.abspath( fpath ))
+    return manifest
+
+def resolve_path( base_dir, path ):
+    return os.path.join( os.path.abspath( os.path.join( base_dir, path )), '' )
+
+def expand_jobs( manifest ):
+    """every job merged with the defaults (paths are resolved by run_job)"""
+    jobs = []
+    for i, entry in enumerate( manifest.get( 'jobs', [] )):
+        job = dict( manifest.get( 'defaults', {} ))
+        # - a malformed entry fails as its own job
+        if isinstance( entry, dict ): job.update( entry )
+        else: job['error'] = 'Job entry is not a table: {!r}'.format( entry )
+        job.setdefault( 'name', 'job{:03d}'.format( i ))
+        jobs.append( job )
+    return jobs
+
+def resolve_paths( job, base_dir = None ):
+    """job with absolute paths, relative to base_dir (the directory of the manifest)"""
+    base_dir = base_dir or os.getcwd()
+    job = dict( job )
+    for key in PATH_KEYS:
+        # - bg_path may be a list ( backgrounds before & after a run )
+        if isinstance( job.get( key ), list ): job[key] = [ resolve_path( base_dir, p ) for p in job[key] ]
+        elif job.get( key ): job[key] = resolve_path( base_dir, job[key] )
+    return job
+
+def engine_arguments( cls ):
+    # named arguments of cls.__init__, and of its parents while **kwargs are passed on
+    names = set()
+    for c in cls.__mro__:
+        if '__init__' not in vars( c ): continue
+        params = list( inspect.signature( c.__init__ ).parameters.values())[1:]
+        names.update( p.name for p in params if p.kind not in ( p.VAR_POSITIONAL, p.VAR_KEYWORD ))
+        if not any( p.kind == p.VAR_KEYWORD for p in params ): break
+    return names
+
+def engine_kwargs( engine, kwargs ):
+    """ExpPL arguments of a job for engine: lab_exppl takes WL_setup & pSSC_range; raise TypeError on arguments the engine does not accept"""
+    kwargs = dict( kwargs )
+    if engine.__name__ == 'lab_exppl':
+        if 'WL_range' in kwargs or 'WL_SSC_split' in kwargs:
+            if 'WL_setup' in kwargs: raise TypeError( 'Job sets WL_setup and WL_range/WL_SSC_split, use one of them' )
+            WL_min, WL_max = kwargs.pop( 'WL_range', [0, 0] )
+            kwargs['WL_setup'] = [ WL_min, WL_max, kwargs.pop( 'WL_SSC_split', None ) ]
+        if 'pSSC_yrange' in kwargs:
+            if 'pSSC_range' in kwargs: raise TypeError( 'Job sets pSSC_range and pSSC_yrange, use one of them' )
+            kwargs['pSSC_range'] = kwargs.pop( 'pSSC_yrange' )
+    unknown = sorted( set( kwargs ) - engine_arguments( engine.ExpPL ))
+    if unknown: raise TypeError( '{}.ExpPL does not accept {}'.format( engine.__name__, ', '.join( unknown )))
+    return kwargs
+
+def count_spectra( processed ):
+    # SpecResult, or out-of-core/time-series ( wavelength, store, metrics )
+    if not processed: return 0
+    return len( processed ) if isinstance( processed, resultlib.SpecResult ) else len( processed[1] )
+
+def run_job( job, n_workers = None, base_dir = None ):
+    """run one job, paths relative to base_dir: return its summary (never raises)"""
+    summary = { 'name': job.get( 'name' ), 'path': job.get( 'path' ), 'mode': job.get( 'mode', 'multiple' ), 'engine': job.get( 'engine', 'exppl' ),
+                'status': 'ok', 'error': None, 'data_sets': 0, 'data_sets_dropped': 0, 'spectra': 0 }
+    start = time.perf_counter()
+    try:
+        if job.get( 'error' ): raise ValueError( job['error'] )
+        job = resolve_paths( job, base_dir )
+        summary['path'] = job.get( 'path' )
+        if not job.get( 'path' ): raise ValueError( 'Job has no path' )
+        if summary['mode'] not in MODES: raise ValueError( 'Unknown mode \'{}\', use one of {}'.format( summary['mode'], MODES ))
+        engine = importlib.import_module( summary['engine'] )
+        kwargs = { k: v for k, v in job.items() if k not in JOB_KEYS }
+        kwargs.setdefault( 'fg_plot', False )
+        kwargs.setdefault( 'fg_verbose', False )
+        exp_pl = engine.ExpPL( **engine_kwargs( engine, kwargs ))
+        if summary['mode'] == 'single':
+            results = [ exp_pl.single_folder( job['path'] ) ]
+        elif summary['mode'] == 'time_series':
+            results = list( exp_pl.time_series_folder( job['path'] ).values())
+        else:
+            results = exp_pl.mutiple_folder( job['path'], n_workers or job.get( 'n_workers', 1 ))
+        exp_pl.wait_export()
+        summary['data_sets'] = len( results )
+        summary['data_sets_dropped'] = sum( r is None for r in results )
+        summary['spectra'] = sum( count_spectra( r ) for r in results )
+        summary['report'] = exp_pl.instr.report()
+    except Exception as e:
+        summary.update( status = 'failed', error = '{}: {}'.format( type( e ).__name__, e ), traceback = traceback.format_exc())
+        logger.error( 'job %s failed: %s', summary['name'], summary['error'] )
+    summary['time'] = time.perf_counter() - start
+    return summary
+
+def run_manifest( manifest, n_workers = None, summary_path = None, fg_fail_fast = False ):
+    """run every job of manifest (path or dict) in order: return the run summary (written to summary_path as JSON)"""
+    manifest_path = manifest if isinstance( manifest, str ) else None
+    if manifest_path: manifest = read_manifest( manifest_path )
+    start = time.perf_counter()
+    run = { 'manifest': manifest_path, 'started': time.strftime( '%Y-%m-%dT%H:%M:%S' ), 'jobs': [] }
+    for job in expand_jobs( manifest ):
+        logger.info( 'job %s: %s', job['name'], job.get( 'path' ))
+        run['jobs'].append( run_job( job, n_workers, manifest.get( 'base_dir' )))
+        if fg_fail_fast and run['jobs'][-1]['status'] != 'ok': break
+    run['time'] = time.perf_counter() - start
+    run['n_jobs'] = len( run['jobs'] )
+    run['n_failed'] = sum( j['status'] != 'ok' for j in run['jobs'] )
+    if summary_path:
+        with open( summary_path, 'w' ) as outfile:
+            json.dump( run, outfile, indent = 2, default = str )
+    return run
+
+def main( argv = None ):
+    parser = argparse.ArgumentParser( description = 'Batch processing of Ocean Optics data trees from a job manifest' )
+    parser.add_argument( 'manifest', help = 'job manifest (.toml or .json)' )
+    parser.add_argument( '--workers', type = int, default = None, help = 'process pool size of every job (overrides n_workers of the manifest)' )
+    parser.add_argument( '--summary', default = None, help = 'write the run summary to JSON file' )
+    parser.add_argument( '--fail-fast', action = 'store_true', help = 'stop at the first failed job' )
+    parser.add_argument( '--log-level', default = 'INFO', help = 'level of the exppl logger' )
+    args = parser.parse_args( argv )
+
+    logging.basicConfig( level = args.log_level.upper(), format = '%(asctime)s %(levelname)s %(message)s' )
+    run = run_manifest( args.manifest, args.workers, args.summary, args.fail_fast )
+    for job in run['jobs']:
+        print( '{:<8}{:<24}{:>6} data sets{:>8} spectra{:>9.2f} s  {}'.format( job['status'], job['name'], job['data_sets'], job['spectra'], job['time'], job['error'] or '' ))
+    return 1 if run['n_failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit( main())
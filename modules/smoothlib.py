@@ -0,0 +1,91 @@
+###############################
+#   Smoothing Kernels         #
+###############################
+
+# Centered moving averages of every row of a 2-D array (n_spectra x n_pixels). The edges
+# are handled like DataFrame.rolling( win, min_periods = 1, center = True, win_type = ... ):
+# the weighted mean uses only the weights which fall inside the spectrum.
+#
+# - triang: scipy.signal.windows.triang weights; direct O(n*win) convolution for small
+#   windows, O(n) running sums for large ones (a triangle is a box convolved with a box)
+# - gaussian: gaussian weights with std = win / 4 over win pixels
+# - savgol: Savitzky-Golay filter (polyorder 2) over win pixels (odd), needs scipy
+
+import numpy as np
+
+KERNELS = ( 'triang', 'gaussian', 'savgol' )
+# above this window the triangular kernel uses running sums
+RUNNING_SUM_WIN = 16
+
+def triang( win ):
+    """triangular window, identical to scipy.signal.windows.triang"""
+    n = np.arange( 1, ( win + 1 ) // 2 + 1 )
+    if win % 2 == 0:
+        w = ( 2 * n - 1.0 ) / win
+        return np.r_[ w, w[::-1] ]
+    w = 2 * n / ( win + 1.0 )
+    return np.r_[ w, w[-2::-1] ]
+
+def gaussian( win, std = None ):
+    n = np.arange( win ) - ( win - 1 ) / 2
+    return np.exp( -0.5 * ( n / ( std or win / 4 )) ** 2 )
+
+def pad_width( win ):
+    # the window of pixel i covers [i - win//2, i + win - 1 - win//2]
+    return ( win // 2, win - 1 - win // 2 )
+
+def smooth_direct( counts, w ):
+    """weighted moving average with symmetric weights w: sliding window product, O(n*win)"""
+    win = len( w )
+    pad = pad_width( win )
+    weighted = np.lib.stride_tricks.sliding_window_view( np.pad( counts, ( (0, 0), pad )), win, axis = 1 ) @ w
+    # - edges: normalize by the weights which fall inside the spectrum (min_periods = 1)
+    norm = np.lib.stride_tricks.sliding_window_view( np.pad( np.ones( counts.shape[1] ), pad ), win ) @ w
+    return weighted / norm
+
+def box_full( x, k ):
+    # full convolution of every row with a box of length k: length n + k - 1
+    c = np.cumsum( np.pad( x, ( (0, 0), (k, k - 1) )), axis = 1 )
+    return c[:, k:] - c[:, :-k]
+
+def triang_full( x, win ):
+    # full convolution with the integer triangle of win: box_k * box_k (odd), plus a shifted copy (even)
+    k = ( win + 1 ) // 2
+    c = box_full( box_full( x, k ), k )
+    if win % 2 == 0:
+        c = np.pad( c, ( (0, 0), (0, 1) )) + np.pad( c, ( (0, 0), (1, 0) ))
+    return c
+
+def smooth_triang_running( counts, win ):
+    """triangular moving average with running sums, O(n) for any window"""
+    n = counts.shape[1]
+    start = win - 1 - win // 2
+    weighted = triang_full( counts, win )[:, start:start+n]
+    norm = triang_full( np.ones( ( 1, n )), win )[:, start:start+n]
+    return weighted / norm
+
+def smooth_triang( counts, win ):
+    """centered triangular moving average of each row, same as DataFrame.rolling( win, min_periods = 1, center = True, win_type = 'triang' )"""
+    counts = np.atleast_2d( np.asarray( counts, dtype = np.float64 ))
+    if win <= 1: return counts.copy()
+    if win > RUNNING_SUM_WIN: return smooth_triang_running( counts, win )
+    return smooth_direct( counts, triang( win ))
+
+def smooth_gaussian( counts, win, std = None ):
+    counts = np.atleast_2d( np.asarray( counts, dtype = np.float64 ))
+    if win <= 1: return counts.copy()
+    return smooth_direct( counts, gaussian( win, std ))
+
+def smooth_savgol( counts, win, polyorder = 2 ):
+    from scipy.signal import savgol_filter
+    counts = np.atleast_2d( np.asarray( counts, dtype = np.float64 ))
+    win = min( win + 1 - win % 2, counts.shape[1] - 1 + counts.shape[1] % 2 )
+    if win <= polyorder: return counts.copy()
+    return savgol_filter( counts, win, polyorder, axis = 1, mode = 'interp' )
+
+def smooth( counts, win, kernel = 'triang' ):
+    """smooth every row of counts with kernel over win pixels"""
+    if kernel == 'triang': return smooth_triang( counts, win )
+    if kernel == 'gaussian': return smooth_gaussian( counts, win )
+    if kernel == 'savgol': return smooth_savgol( counts, win )
+    raise ValueError( 'Unknown smoothing kernel \'{}\', use one of {}'.format( kernel, KERNELS ))
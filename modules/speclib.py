@@ -0,0 +1,125 @@
+###############################
+#   Batched Spectral Engine   #
+###############################
+
+# All functions work on a 2-D array of spectra (n_spectra x n_pixels) which share
+# one wavelength calibration, so every step of ExpPL.read_data is a single array
+# operation over the whole data set instead of a pandas object per spectrum.
+
+import hashlib
+from collections import OrderedDict
+import numpy as np
+import smoothlib
+
+def stack_spectra( wl_list, counts_list ):
+    """group spectra by wavelength calibration: return [ ( row index, wavelength, counts[n, pixel] ), ... ]"""
+    groups = []
+    for i, ( wl, counts ) in enumerate( zip( wl_list, counts_list )):
+        for ind, gwl, gcounts in groups:
+            if gwl.shape == wl.shape and np.array_equal( gwl, wl ):
+                ind.append( i )
+                gcounts.append( counts )
+                break
+        else:
+            groups.append( ( [i], wl, [counts] ))
+    return [ ( np.array( ind ), wl, np.vstack( counts )) for ind, wl, counts in groups ]
+
+def sub_background( counts, bg ):
+    # substract background pixel by pixel and set negative intensity to 0
+    if bg is None: return counts
+    return np.clip( counts - np.asarray( bg, dtype = np.float64 ), 0, None )
+
+def strip_mask( wl, WL_min, WL_max ):
+    # strip laser light: keep wavelength in [WL_min-1, WL_max+1]
+    return ( wl >= WL_min - 1 ) & ( wl <= WL_max + 1 )
+
+# resampling weights of each (calibration, grid); all spectra of one spectrometer share a calibration
+RESAMPLE_CACHE_SIZE = 32
+_resample_cache = OrderedDict()
+
+def resample_weights( wl, grid ):
+    """bracketing pixel index (upper) and linear weight of each grid wavelength; cached per (wl, grid)"""
+    wl, grid = np.asarray( wl, dtype = np.float64 ), np.asarray( grid, dtype = np.float64 )
+    key = hashlib.sha1( wl.tobytes() + b'|' + grid.tobytes()).hexdigest()
+    if key in _resample_cache:
+        _resample_cache.move_to_end( key )
+        return _resample_cache[key]
+    ind = np.clip( np.searchsorted( wl, grid, side = 'right' ), 1, len( wl ) - 1 )
+    lo, hi = wl[ind-1], wl[ind]
+    # - values outside wl are held constant
+    weight = np.clip( ( grid - lo ) / ( hi - lo ), 0, 1 )
+    _resample_cache[key] = ( ind, weight )
+    if len( _resample_cache ) > RESAMPLE_CACHE_SIZE: _resample_cache.popitem( last = False )
+    return ind, weight
+
+def resample( wl, counts, grid ):
+    """linear interpolation of each row from wavelength wl to grid: one gather and one multiply-add"""
+    ind, weight = resample_weights( wl, grid )
+    lo = counts[:, ind-1]
+    return lo + ( counts[:, ind] - lo ) * weight
+
+def wavelength_grid( WL_min, WL_max, step = 1 ):
+    return np.arange( WL_min, WL_max + step / 2, step )
+
+def process_batch( wl, counts, bg = None, WL_range = [0, 0], smo_win = 5, fg_smooth = True, step = 1, kernel = 'triang' ):
+    """background subtraction, smoothing, stripping and interpolation of a batch; return ( wavelength grid, spectra[n, grid] )"""
+    WL_min, WL_max = WL_range
+    counts = sub_background( counts, bg )
+    if fg_smooth:
+        counts = smoothlib.smooth( counts, smo_win, kernel )
+        mask = strip_mask( wl, WL_min, WL_max )
+        wl, counts = wl[mask], counts[:, mask]
+    grid = wavelength_grid( WL_min, WL_max, step )
+    spec = resample( wl, counts, grid )
+    return grid, np.clip( spec, 0, None )
+
+###############################
+#   Metrics                   #
+###############################
+
+def normalize( spec ):
+    return spec / spec.max( axis = 1, keepdims = True )
+
+def integral( spec, WL = None ):
+    # sum of the samples times the step of the (uniform) grid, so IntSpec does not depend on WL_step (1 nm: plain sum)
+    step = WL[1] - WL[0] if WL is not None and len( WL ) > 1 else 1
+    return spec.sum( axis = 1 ) * step
+
+def spec_shift_coef( spec, WL, WL_peak ):
+    # S = [I(>WL_peak) - I(<WL_peak)] / I(WL_min-WL_max)
+    split = WL <= WL_peak
+    return ( spec[:, ~split].sum( axis = 1 ) - spec[:, split].sum( axis = 1 )) / spec.sum( axis = 1 )
+
+def hr_factor( spec, WL, aHR_range ):
+    # H-R factor = max(soulder_peak) / max(main_peak)
+    main = spec[:, ( WL >= aHR_range[0] ) & ( WL < aHR_range[1] )].max( axis = 1 )
+    shoulder = spec[:, ( WL >= aHR_range[2] ) & ( WL < aHR_range[3] )].max( axis = 1 )
+    return shoulder / main
+
+def peak_position( spec, WL ):
+    # wavelength of the maximum intensity
+    return WL[ np.argmax( spec, axis = 1 )]
+
+def centroid( spec, WL ):
+    # intensity-weighted mean wavelength
+    return spec @ WL / spec.sum( axis = 1 )
+
+def fwhm( spec, WL ):
+    # full width at half maximum around the peak; half-maximum crossings are linearly interpolated
+    # - NaN if the spectrum does not fall below half maximum on both sides of the peak
+    rows = np.arange( len( spec ))
+    peak = np.argmax( spec, axis = 1 )
+    above = spec >= spec[rows, peak][:, None] / 2
+    pixel = np.arange( spec.shape[1] )
+    # - last pixel below half maximum left of the peak, first one right of the peak
+    left = np.where( ~above & ( pixel <= peak[:, None] ), pixel, -1 ).max( axis = 1 )
+    right = np.where( ~above & ( pixel >= peak[:, None] ), pixel, spec.shape[1] ).min( axis = 1 )
+    valid = ( left >= 0 ) & ( right < spec.shape[1] )
+    left, right = np.clip( left, 0, spec.shape[1] - 2 ), np.clip( right, 1, spec.shape[1] - 1 )
+    half = spec[rows, peak] / 2
+    def crossing( i, j ):
+        # wavelength where the intensity crosses half maximum between pixel i and j
+        yi, yj = spec[rows, i], spec[rows, j]
+        return WL[i] + ( half - yi ) / np.where( yj != yi, yj - yi, 1 ) * ( WL[j] - WL[i] )
+    width = crossing( right - 1, right ) - crossing( left, left + 1 )
+    return np.where( valid, width, np.nan )
@@ -0,0 +1,115 @@
+###############################
+#   Watch Mode                #
+###############################
+
+# Follow a data set while the spectrometer is writing it: poll the summary files,
+# process only the spectra which are new (or became the brightest acquisition of
+# their folder) with the ExpPL pipeline and keep SSC/aHR/IntSpec up to date.
+
+import os, time, copy
+
+from fpathlib import natural_key
+import datlib
+
+class FolderWatcher:
+    def __init__( self, exp_pl, dir_path, bg_spec = None, callback = None, settle = 0.2, export_interval = 10 ):
+        # private copy of the pipeline: export is throttled by the watcher instead of every merge
+        self.exp_pl = copy.copy( exp_pl )
+        self.exp_pl.fg_save = False
+        self.fg_save = exp_pl.fg_save
+        self.dir_path = os.path.join( dir_path, '' )
+        self.bg_spec = bg_spec
+        # callback( folder name, { metric: value } ) of every processed spectrum
+        self.callback = callback
+        # a spectrum file is read once it was not modified for settle seconds
+        self.settle = settle
+        self.export_interval = export_interval
+        self.last_export = 0
+        self.fg_changed = False
+        # state of every folder: summary stat, path of processed spectrum and its data
+        self.summary_stat = {}
+        self.data = {}
+
+    def scan_summary( self ):
+        # summary files which are new or were modified since the last poll
+        changed = []
+        try: dirs = sorted( ( e.path for e in os.scandir( self.dir_path ) if e.is_dir()), key = natural_key )
+        except OSError: dirs = []
+        for d in dirs:
+            fpath = d + '.dat'
+            try: stat = os.stat( fpath )
+            except OSError: continue
+            key = ( stat.st_mtime_ns, stat.st_size )
+            if self.summary_stat.get( fpath ) != key:
+                changed.append( ( fpath, d, key ))
+        return changed
+
+    def select_spectrum( self, fpath, dir_path ):
+        try: header, spec_id, sum_val = datlib.parse_summary( fpath )
+        except ( OSError, ValueError ): return None
+        max_ind = self.exp_pl.find_index_MaxValList( sum_val ) if len( spec_id ) else -1
+        if max_ind < 0: return None
+        return os.path.join( dir_path, spec_id[max_ind] + '.dat' )
+
+    def is_settled( self, fpath ):
+        try: return time.time() - os.path.getmtime( fpath ) >= self.settle
+        except OSError: return False
+
+    def poll( self ):
+        """process new acquisitions; return names of updated folders"""
+        updated = []
+        for fpath, dir_path, key in self.scan_summary():
+            spec_path = self.select_spectrum( fpath, dir_path )
+            if spec_path is None: continue
+            # the processed spectrum is still the brightest one
+            if dir_path in self.data and self.data[dir_path][0] == spec_path:
+                self.summary_stat[fpath] = key
+                continue
+            # spectrum file is not (completely) written yet: retry at next poll
+            if not self.is_settled( spec_path ): continue
+            try: processed = self.exp_pl.read_data( [spec_path], self.bg_spec )
+            except ( OSError, ValueError ): continue
+            self.data[dir_path] = ( spec_path, processed )
+            self.summary_stat[fpath] = key
+            self.fg_changed = True
+            updated.append( dir_path )
+            if self.callback:
+                Spec, NorSpec, metrics = processed
+                self.callback( os.path.basename( dir_path ), { name: values[0] for name, values in metrics.items() } )
+        return updated
+
+    def collect( self ):
+        # processed data of all folders in natural-sort order, same as ExpPL.read_data + spec_dat_path
+        folders = sorted( self.data, key = natural_key )
+        Spec = [ self.data[d][1][0][0] for d in folders ]
+        NorSpec = [ self.data[d][1][1][0] for d in folders ]
+        metrics = { name: [ self.data[d][1][2][name][0] for d in folders ] for name in self.exp_pl.metric_names() }
+        return Spec, NorSpec, metrics, [ self.data[d][0] for d in folders ]
+
+    def result( self ):
+        """merged spectrum of all processed folders, same as ExpPL.merge_data"""
+        if not self.data: return None
+        return self.exp_pl.merge_data( *self.collect() )
+
+    def export( self, fg_force = False ):
+        # export at most once per export_interval seconds
+        if not ( self.fg_save and self.fg_changed ): return
+        if not fg_force and time.time() - self.last_export < self.export_interval: return
+        self.exp_pl.fg_save = True
+        try: self.result()
+        finally: self.exp_pl.fg_save = False
+        self.last_export = time.time()
+        self.fg_changed = False
+
+    def run( self, interval = 0.5, duration = None ):
+        """poll every interval seconds until duration (or KeyboardInterrupt); return the merged spectrum"""
+        start = time.time()
+        try:
+            while duration is None or time.time() - start < duration:
+                self.poll()
+                self.export()
+                time.sleep( interval )
+        except KeyboardInterrupt:
+            pass
+        self.export( fg_force = True )
+        return self.result()
@@ -0,0 +1,6 @@
+import os, sys
+
+# modules are imported flat ( import speclib ), as in the notebook
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ )), '..', 'modules' ))
+
+EXAMPLE = os.path.join( os.path.dirname( os.path.abspath( __file__ )), '..', 'example' )
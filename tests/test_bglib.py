@@ -0,0 +1,19 @@
+import os
+import numpy as np
+from conftest import EXAMPLE
+import bglib, cachelib, datlib
+
+def test_background_cached( tmp_path, monkeypatch ):
+    paths = [ os.path.join( EXAMPLE, 'background', 'bg', f ) for f in ( '3697.dat', '4929.dat' ) ]
+    cachelib.result_cache.clear()
+    reads = []
+    read_dat = datlib.read_dat
+    monkeypatch.setattr( datlib, 'read_dat', lambda *args: reads.append( args[0] ) or read_dat( *args ))
+    first = bglib.build_background( paths, 'mean', cache_dir = str( tmp_path ))
+    assert len( reads ) == 2
+    # - averaged background of the same frames comes from the result cache
+    second = bglib.build_background( paths, 'mean', cache_dir = str( tmp_path ))
+    assert len( reads ) == 2
+    assert np.array_equal( first[2], second[2] )
+    bglib.build_background( paths, 'median', cache_dir = str( tmp_path ))
+    assert len( reads ) == 4
@@ -0,0 +1,39 @@
+import os, shutil
+import numpy as np
+from conftest import EXAMPLE
+import exppl, cachelib
+
+def run( dir_path, cache_dir, aHR_range ):
+    exp_pl = exppl.ExpPL( [500, 700], WL_SSC_split = 560, aHR_range = aHR_range,
+                          fg_plot = False, fg_save = False, fg_verbose = False, cache_dir = cache_dir )
+    return exp_pl.single_folder( dir_path ), exp_pl.instr.report()['counters']
+
+def test_lru_cache():
+    cache = cachelib.LRUCache( max_bytes = 3 * 800 )
+    # - an empty cache is still used
+    assert cache.get( 'a' ) is None and len( cache ) == 0
+    for key in 'abcd': cache.put( key, np.zeros( 100 ))
+    assert cache.get( 'a' ) is None and cache.get( 'd' ) is not None and len( cache ) == 3
+
+def test_retune_metric_hits_cache( tmp_path ):
+    dir_path = str( tmp_path / 'data' )
+    shutil.copytree( os.path.join( EXAMPLE, 'single data set' ), dir_path )
+    cachelib.result_cache.clear()
+    first, counters = run( dir_path, str( tmp_path / 'cache' ), [550, 570, 590, 610] )
+    assert counters['spectra_cached'] == 0 and counters['files_read'] == len( first )
+    assert len( cachelib.result_cache ) > 0
+    # - only the H-R windows changed: spectra come from the cache, no spectrum file is read
+    second, counters = run( dir_path, str( tmp_path / 'cache' ), [520, 540, 620, 660] )
+    assert counters['spectra_cached'] == len( second ) and counters['files_read'] == 0
+    assert np.array_equal( first.intensity, second.intensity )
+    assert np.array_equal( first.metrics['SpecShiftCoef'], second.metrics['SpecShiftCoef'] )
+    assert not np.array_equal( first.metrics['aHR'], second.metrics['aHR'] )
+
+def test_out_of_core_bypasses_cache( tmp_path ):
+    dir_path = str( tmp_path / 'data' )
+    shutil.copytree( os.path.join( EXAMPLE, 'single data set' ), dir_path )
+    cachelib.result_cache.clear()
+    exp_pl = exppl.ExpPL( [500, 700], WL_SSC_split = 560, fg_plot = False, fg_save = False, fg_verbose = False,
+                          cache_dir = str( tmp_path / 'cache' ), fg_out_of_core = True, chunk_size = 2 )
+    WL, store, metrics = exp_pl.single_folder( dir_path )
+    assert len( store ) == 4 and len( cachelib.result_cache ) == 0
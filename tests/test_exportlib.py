@@ -0,0 +1,20 @@
+import importlib.util
+import pytest
+import exportlib, exppl
+
+def test_unknown_format():
+    with pytest.raises( ValueError ):
+        exportlib.get_exporter( 'csv' )
+
+def test_missing_package( monkeypatch ):
+    # - checked when ExpPL is created, not at export time
+    monkeypatch.setitem( exportlib.REQUIRES, 'hdf5', ( 'no_such_package', ))
+    with pytest.raises( ImportError, match = 'no_such_package' ):
+        exportlib.get_exporter( 'hdf5' )
+    with pytest.raises( ImportError ):
+        exppl.ExpPL( [500, 700], export_format = 'hdf5', fg_plot = False, fg_verbose = False )
+
+def test_available_format():
+    assert exportlib.get_exporter( 'XLSX' ) is exportlib.export_xlsx
+    if importlib.util.find_spec( 'tables' ):
+        assert exportlib.get_exporter( 'hdf5' ) is exportlib.export_hdf5
@@ -0,0 +1,60 @@
+import os, shutil, hashlib
+import pytest
+from conftest import EXAMPLE
+import exppl
+
+def exp_pl( tmp_path, **kwargs ):
+    return exppl.ExpPL( [500, 700], bg_path = os.path.join( EXAMPLE, 'background', '' ), WL_SSC_split = 560, aHR_range = [550, 570, 590, 610],
+                        fg_plot = False, fg_save = False, fg_verbose = False, cache_dir = str( tmp_path / 'cache' ), **kwargs )
+
+def data_tree( tmp_path ):
+    dir_path = tmp_path / 'data'
+    shutil.copytree( os.path.join( EXAMPLE, 'multiple data sets' ), dir_path )
+    return str( dir_path )
+
+def test_pool_error_of_data_set( tmp_path ):
+    # - an error of a data set in a worker is raised, not retried in serial
+    dir_path = data_tree( tmp_path )
+    e = exp_pl( tmp_path )
+    spec_path = e.read_dat_path( os.path.join( dir_path, 'dilute MEH-PPV (45-60)', '' ))
+    os.remove( spec_path[0] )
+    events = []
+    e.instr.callback = events.append
+    with pytest.raises( FileNotFoundError ):
+        e.mutiple_folder( dir_path, n_workers = 2 )
+    assert not any( 'Process pool' in str( ev.get( 'message' )) for ev in events )
+
+def test_pool_not_available( tmp_path, monkeypatch ):
+    def no_pool( *args, **kwargs ): raise NotImplementedError( 'no processes' )
+    monkeypatch.setattr( exppl, 'ProcessPoolExecutor', no_pool )
+    dir_path = data_tree( tmp_path )
+    events = []
+    e = exp_pl( tmp_path, log_callback = events.append )
+    results = e.mutiple_folder( dir_path, n_workers = 2 )
+    assert [ len( r ) for r in results ] == [ 8, 8 ]
+    assert any( 'Process pool is not available' in str( ev.get( 'message' )) for ev in events )
+
+def test_pool_results( tmp_path ):
+    dir_path = data_tree( tmp_path )
+    serial = exp_pl( tmp_path ).mutiple_folder( dir_path )
+    pooled = exp_pl( tmp_path ).mutiple_folder( dir_path, n_workers = 2 )
+    assert [ r.names for r in serial ] == [ r.names for r in pooled ]
+
+def test_pool_report( tmp_path ):
+    # - stages & counters of the workers are merged into the report
+    dir_path = data_tree( tmp_path )
+    serial, pooled = exp_pl( tmp_path, fg_cache = False ), exp_pl( tmp_path, fg_cache = False )
+    serial.mutiple_folder( dir_path )
+    pooled.mutiple_folder( dir_path, n_workers = 2 )
+    report = [ e.instr.report() for e in ( serial, pooled ) ]
+    assert report[0]['counters'] == report[1]['counters']
+    assert { k: v['calls'] for k, v in report[0]['stages'].items() } == { k: v['calls'] for k, v in report[1]['stages'].items() }
+    assert report[1]['counters']['files_read'] > 1 and 'read_data' in report[1]['stages']
+
+def test_one_catalog_per_tree( tmp_path ):
+    dir_path = data_tree( tmp_path )
+    e = exp_pl( tmp_path )
+    e.mutiple_folder( dir_path )
+    # - one catalog of the data tree (and one of the background tree), not one per data set
+    catalogs = { hashlib.sha1( t.encode( 'utf-8' )).hexdigest() + '.sqlite' for t in e.trees }
+    assert len( catalogs ) == 2 and set( os.listdir( tmp_path / 'cache' / 'catalog' )) == catalogs
@@ -0,0 +1,30 @@
+import os, shutil
+from conftest import EXAMPLE
+import exppl, fpathlib
+
+def test_refresh_subtree( tmp_path ):
+    shutil.copytree( os.path.join( EXAMPLE, 'multiple data sets' ), tmp_path / 'data' )
+    tree = fpathlib.TreeIndex( str( tmp_path / 'data' ))
+    set_dir = tmp_path / 'data' / 'dilute MEH-PPV (0-30)'
+    ( set_dir / 't90p00' ).mkdir()
+    ( tmp_path / 'data' / 'dilute MEH-PPV (45-60)' / 't90p00' ).mkdir()
+    # - only the subtree of the data set is scanned again: the data set & its new folder
+    assert tree.refresh( str( set_dir )) == 2
+    assert 't90p00' in tree.subdirs( str( set_dir ))
+    assert 't90p00' not in tree.subdirs( str( tmp_path / 'data' / 'dilute MEH-PPV (45-60)' ))
+    assert tree.covers( str( tmp_path / 'data' / 'dilute MEH-PPV (45-60)' / 't60p90' ))
+
+def test_read_dat_path_sees_new_folders( tmp_path ):
+    src = os.path.join( EXAMPLE, 'single data set' )
+    dir_path = tmp_path / 'data'
+    dir_path.mkdir()
+    for name in ( 't30p00', 't30p30' ):
+        shutil.copytree( os.path.join( src, name ), dir_path / name )
+        shutil.copy( os.path.join( src, name + '.dat' ), dir_path / ( name + '.dat' ))
+    exp_pl = exppl.ExpPL( [500, 700], fg_plot = False, fg_save = False, fg_verbose = False, cache_dir = str( tmp_path / 'cache' ))
+    assert len( exp_pl.read_dat_path( str( dir_path ))) == 2
+    # - a folder written after the first call
+    shutil.copytree( os.path.join( src, 't30p60' ), dir_path / 't30p60' )
+    shutil.copy( os.path.join( src, 't30p60.dat' ), dir_path / 't30p60.dat' )
+    assert len( exp_pl.read_dat_path( str( dir_path ))) == 3
+    assert len( exp_pl.read_time_series_path( str( dir_path ))) == 3
@@ -0,0 +1,17 @@
+import logging
+import pytest
+import exppl, instrlib
+
+def test_quiet_warnings( tmp_path, capsys ):
+    # - fg_verbose = False: warnings are neither printed nor written to stderr by logging's last resort
+    exp_pl = exppl.ExpPL( [500, 700], fg_plot = False, fg_save = False, fg_verbose = False, cache_dir = str( tmp_path / 'cache' ))
+    exp_pl.instr.log( 'a warning', level = logging.WARNING )
+    with pytest.raises( FileNotFoundError ):
+        exp_pl.mutiple_folder( str( tmp_path ))
+    assert capsys.readouterr() == ( '', '' )
+
+def test_verbose_warning_once( capsys ):
+    instr = instrlib.Instrument( fg_verbose = True )
+    instr.warn( 'once' )
+    out, err = capsys.readouterr()
+    assert out == 'once\n' and err == ''
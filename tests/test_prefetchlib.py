@@ -0,0 +1,29 @@
+import os
+from conftest import EXAMPLE
+import exppl, prefetchlib
+
+def test_prefetch_order():
+    assert list( prefetchlib.prefetch( lambda x: x * x, range( 50 ), n_threads = 8, depth = 4 )) == [ x * x for x in range( 50 ) ]
+
+def test_read_log_order( tmp_path ):
+    # - the messages of the prefetched files are logged in file order, from the calling thread
+    events = []
+    exp_pl = exppl.ExpPL( [500, 700], WL_SSC_split = 560, aHR_range = [550, 570, 590, 610], fg_plot = False, fg_save = False,
+                          fg_verbose = False, fg_cache = False, io_threads = 8, log_callback = events.append )
+    dir_path = os.path.join( EXAMPLE, 'single data set', '' )
+    spec_dat_path = exp_pl.read_dat_path( dir_path )
+    exp_pl.read_data( spec_dat_path, None )
+    logged = [ e['message'][len( 'dat: ' ):] for e in events if e.get( 'message', '' ).startswith( 'dat: ' ) ]
+    assert logged == [ '/'.join( p.split( os.sep )[-2:] ) for p in spec_dat_path ]
+
+def test_read_without_stat( tmp_path, monkeypatch ):
+    # - spectrum files are fingerprinted from the scanned tree: neither read_batch nor the .dat cache stats them
+    exp_pl = exppl.ExpPL( [500, 700], WL_SSC_split = 560, fg_plot = False, fg_save = False, fg_verbose = False, cache_dir = str( tmp_path ))
+    dir_path = os.path.join( EXAMPLE, 'single data set', '' )
+    exp_pl.scan_tree( dir_path, fg_refresh = True )
+    spec_dat_path = exp_pl.read_dat_path( dir_path )
+    stats = []
+    stat = os.stat
+    monkeypatch.setattr( os, 'stat', lambda path, *args, **kwargs: stats.append( str( path )) or stat( path, *args, **kwargs ))
+    exp_pl.read_batch( spec_dat_path, None, fg_result_cache = False )
+    assert not [ p for p in stats if p.endswith( '.dat' ) ]
@@ -0,0 +1,34 @@
+import pytest
+import runlib, exppl, lab_exppl
+
+def test_lab_engine_kwargs():
+    kwargs = runlib.engine_kwargs( lab_exppl, { 'WL_range': [500, 700], 'WL_SSC_split': 560, 'pSSC_yrange': [0.2, 0.8], 'smo_win': 10 } )
+    assert kwargs == { 'WL_setup': [500, 700, 560], 'pSSC_range': [0.2, 0.8], 'smo_win': 10 }
+    exp_pl = lab_exppl.ExpPL( fg_plot = False, fg_verbose = False, **kwargs )
+    assert ( exp_pl.WL_min, exp_pl.WL_max, exp_pl.WL_peak ) == ( 500, 700, 560 )
+
+def test_unknown_argument():
+    assert runlib.engine_kwargs( exppl, { 'WL_range': [500, 700] } ) == { 'WL_range': [500, 700] }
+    with pytest.raises( TypeError, match = 'smo_wn' ):
+        runlib.engine_kwargs( exppl, { 'smo_wn': 3 } )
+    with pytest.raises( TypeError ):
+        runlib.engine_kwargs( lab_exppl, { 'WL_setup': [500, 700, 560], 'WL_range': [500, 700] } )
+
+def test_failed_job_summary():
+    summary = runlib.run_job( { 'name': 'typo', 'path': 'missing', 'smo_wn': 3 } )
+    assert summary['status'] == 'failed' and 'smo_wn' in summary['error']
+
+def test_expand_background_list( tmp_path ):
+    manifest = { 'base_dir': str( tmp_path ), 'defaults': { 'WL_range': [500, 700] },
+                 'jobs': [ { 'path': 'data', 'bg_path': [ 'bg_before', 'bg_after' ] } ] }
+    job, = runlib.expand_jobs( manifest )
+    job = runlib.resolve_paths( job, manifest['base_dir'] )
+    assert job['bg_path'] == [ str( tmp_path / 'bg_before' ) + '/', str( tmp_path / 'bg_after' ) + '/' ]
+    assert job['path'] == str( tmp_path / 'data' ) + '/'
+
+def test_job_errors_are_per_job( tmp_path ):
+    manifest = { 'base_dir': str( tmp_path ), 'jobs': [ { 'name': 'bad', 'path': 'data', 'bg_path': 5 }, 'not a job', { 'name': 'typo', 'path': 'data', 'smo_wn': 3 } ] }
+    run = runlib.run_manifest( manifest )
+    assert run['n_jobs'] == 3 and run['n_failed'] == 3
+    assert [ j['name'] for j in run['jobs'] ] == [ 'bad', 'job001', 'typo' ]
+    assert 'smo_wn' in run['jobs'][2]['error']
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+import smoothlib
+
+pytest.importorskip( 'scipy' )
+
+def counts( n_spec = 3, n = 300, seed = 0 ):
+    rng = np.random.default_rng( seed )
+    x = np.arange( n )
+    return np.exp( -0.5 * (( x - n / 2 ) / 30 )**2 ) * 1000 + rng.normal( 0, 20, ( n_spec, n ))
+
+def rolling( data, win, win_type, **kwargs ):
+    # reference: pandas rolling of every spectrum (columns)
+    return pd.DataFrame( data.T ).rolling( win, min_periods = 1, center = True, win_type = win_type ).mean( **kwargs ).values.T
+
+# - windows of the direct path ( <= RUNNING_SUM_WIN ) and of the running-sum path, odd & even
+@pytest.mark.parametrize( 'win', [ 2, 3, 4, 5, 8, 15, 16, 17, 24, 31, 64 ] )
+def test_triang_equals_rolling( win ):
+    data = counts()
+    assert np.allclose( smoothlib.smooth( data, win, 'triang' ), rolling( data, win, 'triang' ), rtol = 1e-10, atol = 1e-8 )
+
+def test_triang_paths_agree():
+    data = counts()
+    for win in ( 17, 24, 33 ):
+        assert np.allclose( smoothlib.smooth_triang_running( data, win ), smoothlib.smooth_direct( data, smoothlib.triang( win )))
+
+def test_triang_window():
+    from scipy.signal.windows import triang
+    for win in range( 1, 20 ):
+        assert np.allclose( smoothlib.triang( win ), triang( win ))
+
+def test_window_one():
+    data = counts()
+    assert np.array_equal( smoothlib.smooth( data, 1 ), data )
+
+@pytest.mark.parametrize( 'win', [ 4, 5, 20 ] )
+def test_gaussian_equals_rolling( win ):
+    data = counts()
+    assert np.allclose( smoothlib.smooth( data, win, 'gaussian' ), rolling( data, win, 'gaussian', std = win / 4 ))
+
+def test_savgol():
+    from scipy.signal import savgol_filter
+    data = counts()
+    assert np.allclose( smoothlib.smooth( data, 7, 'savgol' ), savgol_filter( data, 7, 2, axis = 1, mode = 'interp' ))
+    # - even windows use the next odd window; a quadratic is unchanged
+    assert np.allclose( smoothlib.smooth( data, 6, 'savgol' ), smoothlib.smooth( data, 7, 'savgol' ))
+    x = np.arange( 100.0 )
+    assert np.allclose( smoothlib.smooth( 3 * x**2 - x + 2, 9, 'savgol' ), 3 * x**2 - x + 2 )
+
+def test_unknown_kernel():
+    with pytest.raises( ValueError ):
+        smoothlib.smooth( counts(), 5, 'box' )
@@ -0,0 +1,19 @@
+import os
+import numpy as np
+from conftest import EXAMPLE
+import exppl, speclib
+
+def test_integral_step():
+    WL = np.arange( 500, 701, 1.0 )
+    spec = np.exp( -0.5 * (( WL - 600 ) / 20 )**2 )[None]
+    assert np.array_equal( speclib.integral( spec, WL ), spec.sum( axis = 1 ))
+    fine = np.arange( 500, 700.01, 0.25 )
+    assert np.allclose( speclib.integral( np.exp( -0.5 * (( fine - 600 ) / 20 )**2 )[None], fine ), spec.sum( axis = 1 ), rtol = 1e-6 )
+
+def test_intspec_independent_of_step( tmp_path ):
+    dir_path = os.path.join( EXAMPLE, 'single data set', '' )
+    IntSpec = []
+    for step in ( 1, 0.25 ):
+        e = exppl.ExpPL( [500, 700], WL_step = step, fg_plot = False, fg_save = False, fg_verbose = False, cache_dir = str( tmp_path ))
+        IntSpec.append( e.single_folder( dir_path ).metrics['IntSpec'] )
+    assert np.allclose( IntSpec[0], IntSpec[1], rtol = 0.01 )
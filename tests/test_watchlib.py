@@ -0,0 +1,43 @@
+import os, shutil, time
+import numpy as np
+from conftest import EXAMPLE
+import exppl
+from watchlib import FolderWatcher
+
+def age( path, seconds = 60 ):
+    t = time.time() - seconds
+    os.utime( path, ( t, t ))
+
+def make_watcher( tmp_path ):
+    src = os.path.join( EXAMPLE, 'single data set' )
+    data = tmp_path / 'data'
+    shutil.copytree( os.path.join( src, 't30p00' ), data / 't30p00' )
+    shutil.copy( os.path.join( src, 't30p00.dat' ), data / 't30p00.dat' )
+    for f in ( data / 't30p00' ).iterdir(): age( f )
+    exp_pl = exppl.ExpPL( [500, 700], bg_path = os.path.join( EXAMPLE, 'background', '' ), WL_SSC_split = 560, aHR_range = [550, 570, 590, 610], fg_plot = False, fg_save = False,
+                          fg_verbose = False, cache_dir = str( tmp_path / 'cache' ))
+    return FolderWatcher( exp_pl, str( data ), exp_pl.read_background(), settle = 0.2 ), data
+
+def test_poll_processes_brightest( tmp_path ):
+    watcher, data = make_watcher( tmp_path )
+    assert [ os.path.basename( d ) for d in watcher.poll() ] == ['t30p00']
+    assert os.path.basename( watcher.data[str( data / 't30p00' )][0] ) == '6131.dat'
+    # - nothing changed
+    assert watcher.poll() == []
+
+def test_new_brightest_not_settled( tmp_path ):
+    watcher, data = make_watcher( tmp_path )
+    watcher.poll()
+    dir_path = str( data / 't30p00' )
+    # - brighter acquisition whose spectrum file is still being written
+    wl, counts = np.loadtxt( data / 't30p00' / '6131.dat', usecols = ( 1, 2 ), unpack = True )
+    np.savetxt( data / 't30p00' / '10358.dat', np.column_stack( [ np.arange( len( wl )), wl, 2 * counts ] ), fmt = '%g', delimiter = '\t' )
+    with open( data / 't30p00.dat', 'a' ) as f:
+        f.write( '10358\t0\t0\t50\t9000\t6000\t2000\t400\t0\t0\t200\t\n' )
+    assert watcher.poll() == []
+    assert os.path.basename( watcher.data[dir_path][0] ) == '6131.dat'
+    # - written completely: processed at the next poll
+    age( data / 't30p00' / '10358.dat' )
+    assert watcher.poll() == [dir_path]
+    assert os.path.basename( watcher.data[dir_path][0] ) == '10358.dat'
+    assert watcher.poll() == []